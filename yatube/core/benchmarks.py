@@ -0,0 +1,140 @@
+import gc
+import importlib
+import json
+import pkgutil
+import statistics
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+_registry = {}
+
+
+def benchmark(name, cold=True):
+    """Регистрирует микробенчмарк.
+
+    Функция получает данные, подготовленные setup() пакета, и возвращает
+    функцию без аргументов, время которой измеряется. При cold=True
+    перед каждым замером очищается кеш.
+    """
+    def decorator(func):
+        _registry[name] = (func, cold)
+        return func
+    return decorator
+
+
+def discover(package):
+    """Импортирует модули пакета, регистрируя их бенчмарки."""
+    module = importlib.import_module(package)
+    for info in pkgutil.iter_modules(module.__path__):
+        importlib.import_module(f'{package}.{info.name}')
+    return module
+
+
+def measure(target, repeat, cold):
+    """Медиана и минимум времени в миллисекундах и число запросов."""
+    if cold:
+        cache.clear()
+    target()
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        if cold:
+            cache.clear()
+        gc.collect()
+        gc.disable()
+        try:
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                target()
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            gc.enable()
+        queries = len(captured)
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'queries': queries,
+    }
+
+
+def _calibration_workload():
+    return sorted(str(number * 7919 % 10007) for number in range(20000))
+
+
+def calibrate(repeat=20):
+    """Время эталонной нагрузки на этой машине, мс: им масштабируется
+    базовая линия, записанная на другой."""
+    return measure(_calibration_workload, repeat, cold=False)['min_ms']
+
+
+def run(package, repeat=20, names=None):
+    """Прогоняет бенчмарки пакета на данных его setup()."""
+    module = discover(package)
+    data = module.setup()
+    results = {}
+    for name, (func, cold) in sorted(_registry.items()):
+        if names and name not in names:
+            continue
+        results[name] = measure(func(data), repeat, cold)
+    return {'calibration_ms': calibrate(repeat), 'benchmarks': results}
+
+
+def regressions(baseline, results, threshold):
+    """Ухудшения относительно базовой линии: больше запросов или
+    лучшее время хуже более чем на threshold (доля).
+
+    Минимум меньше, чем медиана, зависит от фоновой нагрузки, а разница
+    в скорости машин учитывается по калибровочному замеру.
+    """
+    scale = 1.0
+    if baseline.get('calibration_ms') and results.get('calibration_ms'):
+        scale = results['calibration_ms'] / baseline['calibration_ms']
+    found = []
+    for name, result in sorted(results['benchmarks'].items()):
+        base = baseline.get('benchmarks', {}).get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries']:
+            found.append(
+                f'{name}: запросов {base["queries"]} -> {result["queries"]}')
+        expected = base['min_ms'] * scale
+        if result['min_ms'] > expected * (1 + threshold):
+            found.append(
+                f'{name}: время {expected:.2f} -> '
+                f'{result["min_ms"]:.2f} мс '
+                f'({result["min_ms"] / expected - 1:+.0%})')
+    return found
+
+
+def report(results, baseline=None):
+    baseline = (baseline or {}).get('benchmarks', {})
+    results = results['benchmarks']
+    width = max(map(len, results), default=0)
+    lines = []
+    for name, result in sorted(results.items()):
+        line = (f'{name.ljust(width)}  мин. {result["min_ms"]:8.2f} мс  '
+                f'мед. {result["median_ms"]:8.2f} мс  '
+                f'{result["queries"]:3} запр.')
+        base = baseline.get(name)
+        if base:
+            line += (f'  (было {base["min_ms"]:.2f} мс, '
+                     f'{base["queries"]} запр.)')
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def load(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save(results, path):
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write('\n')
@@ -0,0 +1,384 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache.backends import locmem
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import profiling
+
+_MISSING = object()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+CREATE TABLE IF NOT EXISTS cache_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL
+);
+"""
+# Запись журнала, после которой L1 очищается целиком.
+CLEAR_MARK = '*'
+# Как часто (в записях) чистить просроченные ключи и журнал.
+CULL_EVERY = 100
+# Ограничение SQLite на число параметров запроса.
+MAX_VARIABLES = 900
+
+
+class ProfiledCacheMixin:
+    """Учитывает попадания и промахи кеша в профиле запроса."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            profiling.record_cache(misses=1)
+            return default
+        profiling.record_cache(hits=1)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        profiling.record_cache(
+            hits=len(found), misses=len(keys) - len(found))
+        return found
+
+
+class LocMemCache(ProfiledCacheMixin, locmem.LocMemCache):
+    pass
+
+
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+# Соединения с L2 по (pid, поток, файл). Django создаёт экземпляр кеша
+# на каждый контекст, а под ASGI контекст свой у каждого запроса:
+# соединение не должно жить и умирать вместе с экземпляром.
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def _connect(location):
+    directory = os.path.dirname(location)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(
+        location, timeout=30, isolation_level=None, check_same_thread=False,
+    )
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class _LocalTier:
+    """Общий для потоков процесса L1: LRU и номер последней
+    просмотренной записи журнала инвалидаций."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.seq = None
+        self.synced = 0.0
+        self.writes = 0
+
+
+class BaseTwoTierCache(BaseCache):
+    """Кеш из двух уровней: LRU в памяти процесса (L1) перед общим для
+    всех воркеров файлом SQLite на локальном диске (L2).
+
+    Каждая запись и удаление в L2 добавляют строку в журнал
+    инвалидаций; её номер служит штампом версии. Раз в SYNC_INTERVAL
+    секунд процесс читает журнал после своего последнего штампа
+    и выбрасывает из L1 изменённые другими воркерами ключи.
+
+    OPTIONS: MAX_ENTRIES и CULL_FREQUENCY для L2, L1_MAX_ENTRIES,
+    SYNC_INTERVAL, LOG_MAX_ENTRIES.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location
+        self.l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self.sync_interval = float(options.get('SYNC_INTERVAL', 1.0))
+        self.log_max_entries = int(options.get('LOG_MAX_ENTRIES', 10000))
+        self.pickle_protocol = pickle.HIGHEST_PROTOCOL
+        with _local_tiers_lock:
+            self._tier = _local_tiers.setdefault(location, _LocalTier())
+
+    # L2
+
+    @property
+    def db(self):
+        key = (os.getpid(), threading.get_ident(), self.location)
+        connection = _connections.get(key)
+        if connection is None:
+            connection = _connect(self.location)
+            with _connections_lock:
+                _connections[key] = connection
+        return connection
+
+    @contextmanager
+    def _write(self):
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def _log(self, db, keys):
+        db.executemany(
+            'INSERT INTO cache_log (key) VALUES (?)', [(key,) for key in keys])
+        return db.execute('SELECT last_insert_rowid()').fetchone()[0]
+
+    def _cull(self, db, now):
+        with self._tier.lock:
+            self._tier.writes += 1
+            writes = self._tier.writes
+        if writes % CULL_EVERY:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        count = db.execute('SELECT count(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency or 1,),
+            )
+        db.execute(
+            'DELETE FROM cache_log WHERE seq <= '
+            '(SELECT max(seq) FROM cache_log) - ?',
+            (self.log_max_entries,),
+        )
+
+    # L1
+
+    def _sync(self):
+        """Выбрасывает из L1 ключи, изменённые другими процессами."""
+        tier = self._tier
+        now = time.monotonic()
+        if tier.seq is not None and now - tier.synced < self.sync_interval:
+            return
+        db = self.db
+        with tier.lock:
+            if tier.seq is None:
+                tier.entries.clear()
+                tier.seq = db.execute(
+                    'SELECT coalesce(max(seq), 0) FROM cache_log'
+                ).fetchone()[0]
+            else:
+                rows = db.execute(
+                    'SELECT seq, key FROM cache_log WHERE seq > ? '
+                    'ORDER BY seq', (tier.seq,)
+                ).fetchall()
+                oldest = db.execute(
+                    'SELECT min(seq) FROM cache_log').fetchone()[0]
+                if oldest is not None and oldest > tier.seq + 1:
+                    # Журнал обрезан раньше, чем процесс его дочитал.
+                    tier.entries.clear()
+                for _, key in rows:
+                    if key == CLEAR_MARK:
+                        tier.entries.clear()
+                    tier.entries.pop(key, None)
+                if rows:
+                    tier.seq = rows[-1][0]
+            tier.synced = now
+
+    def _l1_get(self, key, now):
+        tier = self._tier
+        with tier.lock:
+            entry = tier.entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires = entry
+            if expires is not None and expires <= now:
+                del tier.entries[key]
+                return _MISSING
+            tier.entries.move_to_end(key)
+            return value
+
+    def _l1_set(self, key, value, expires):
+        tier = self._tier
+        with tier.lock:
+            tier.entries[key] = (value, expires)
+            tier.entries.move_to_end(key)
+            while len(tier.entries) > self.l1_max_entries:
+                tier.entries.popitem(last=False)
+
+    def _l1_delete(self, keys):
+        tier = self._tier
+        with tier.lock:
+            for key in keys:
+                tier.entries.pop(key, None)
+
+    # API кеша Django
+
+    def _make_key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def get(self, key, default=None, version=None):
+        found = self._get_many([self._make_key(key, version)])
+        return next(iter(found.values()), default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._make_key(key, version): key for key in keys}
+        found = self._get_many(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def _get_many(self, keys):
+        self._sync()
+        now = time.time()
+        found = {}
+        missing = []
+        for key in keys:
+            value = self._l1_get(key, now)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        for start in range(0, len(missing), MAX_VARIABLES):
+            chunk = missing[start:start + MAX_VARIABLES]
+            rows = self.db.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN (%s)'
+                % ', '.join('?' * len(chunk)), chunk
+            ).fetchall()
+            for key, data, expires in rows:
+                if expires is not None and expires <= now:
+                    continue
+                value = pickle.loads(data)
+                found[key] = value
+                self._l1_set(key, value, expires)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set_many({self._make_key(key, version): value}, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set_many({
+            self._make_key(key, version): value
+            for key, value in data.items()
+        }, timeout)
+        return []
+
+    def _set_many(self, data, timeout):
+        if not data:
+            return
+        expires = self._expires(timeout)
+        now = time.time()
+        rows = [
+            (key, pickle.dumps(value, self.pickle_protocol), expires)
+            for key, value in data.items()
+        ]
+        with self._write() as db:
+            db.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)', rows)
+            self._log(db, data)
+            self._cull(db, now)
+        for key, value in data.items():
+            self._l1_set(key, value, expires)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._make_key(key, version)
+        expires = self._expires(timeout)
+        now = time.time()
+        with self._write() as db:
+            cursor = db.execute(
+                'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+                'expires = excluded.expires '
+                'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+                (key, pickle.dumps(value, self.pickle_protocol), expires, now),
+            )
+            added = cursor.rowcount > 0
+            if added:
+                self._log(db, [key])
+        if added:
+            self._l1_set(key, value, expires)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._make_key(key, version)
+        expires = self._expires(timeout)
+        with self._write() as db:
+            cursor = db.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (expires, key, time.time()),
+            )
+            touched = cursor.rowcount > 0
+            if touched:
+                self._log(db, [key])
+        self._l1_delete([key])
+        return touched
+
+    def incr(self, key, delta=1, version=None):
+        key = self._make_key(key, version)
+        now = time.time()
+        with self._write() as db:
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or row[1] is not None and row[1] <= now:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, self.pickle_protocol), key),
+            )
+            self._log(db, [key])
+        self._l1_set(key, value, row[1])
+        return value
+
+    def delete(self, key, version=None):
+        return self._delete_many([self._make_key(key, version)])
+
+    def delete_many(self, keys, version=None):
+        self._delete_many([self._make_key(key, version) for key in keys])
+
+    def _delete_many(self, keys):
+        if not keys:
+            return False
+        with self._write() as db:
+            deleted = db.executemany(
+                'DELETE FROM cache WHERE key = ?', [(key,) for key in keys]
+            ).rowcount
+            self._log(db, keys)
+        self._l1_delete(keys)
+        return deleted > 0
+
+    def has_key(self, key, version=None):
+        return bool(self._get_many([self._make_key(key, version)]))
+
+    def clear(self):
+        with self._write() as db:
+            db.execute('DELETE FROM cache')
+            db.execute('DELETE FROM cache_log')
+            self._log(db, [CLEAR_MARK])
+        tier = self._tier
+        with tier.lock:
+            tier.entries.clear()
+            tier.seq = None
+
+    def close(self, **kwargs):
+        # Соединение живёт в _connections, пока жив поток: Django
+        # закрывает кеши после каждого запроса, а открывать файл заново
+        # дорого.
+        pass
+
+
+class TwoTierCache(ProfiledCacheMixin, BaseTwoTierCache):
+    pass
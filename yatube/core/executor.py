@@ -0,0 +1,87 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+# Обёртки выполнения SQL, действующие в текущем контексте: run() ставит
+# их на соединения потока пула, в котором выполняется функция.
+_wrappers = contextvars.ContextVar('execute_wrappers', default=())
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+@contextmanager
+def _installed(wrappers):
+    with ExitStack() as stack:
+        for connection in connections.all():
+            for wrapper in wrappers:
+                stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+@contextmanager
+def execute_wrapper(wrapper):
+    """connection.execute_wrapper для всех соединений, который действует
+    и на запросы асинхронных view, выполняемые через run()."""
+    token = _wrappers.set((*_wrappers.get(), wrapper))
+    try:
+        with _installed((wrapper,)):
+            yield
+    finally:
+        _wrappers.reset(token)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_DB_WORKERS,
+                thread_name_prefix='orm',
+            )
+        return _executor
+
+
+def _close_broken():
+    """Закрывает соединения потока, которые ошибка оставила в
+    непригодном состоянии; исправные остаются потоку до его выхода."""
+    for connection in connections.all():
+        if connection.connection is None or not connection.errors_occurred:
+            continue
+        if (connection.get_autocommit()
+                == connection.settings_dict['AUTOCOMMIT']
+                and connection.is_usable()):
+            connection.errors_occurred = False
+        else:
+            connection.close()
+
+
+def _call(func, args, kwargs):
+    try:
+        with _installed(_wrappers.get()):
+            return func(*args, **kwargs)
+    finally:
+        _close_broken()
+
+
+async def run(func, *args, **kwargs):
+    """Выполняет синхронную функцию (ORM, кеш, шаблоны) в пуле потоков.
+
+    Пул ограничен ASYNC_DB_WORKERS, поэтому соединений с базой не больше,
+    чем потоков, сколько бы запросов ни ждало в цикле событий. Поток
+    держит своё соединение между вызовами и освобождает при выходе, а не
+    переподключается на каждый вызов. Функция видит contextvars
+    вызывающего кода, в том числе профиль запроса.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(),
+        functools.partial(context.run, _call, func, args, kwargs),
+    )
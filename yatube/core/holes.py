@@ -0,0 +1,72 @@
+"""Дырки в кешируемых страницах, в духе edge-side includes.
+
+Фрагмент страницы, зависящий от пользователя, выводится тегом
+{% hole 'имя' параметр=значение %} и рендерится зарегистрированной
+функцией fn(request, **параметры). Если запрос собирает дырки
+(request.collect_holes), фрагмент обрамляется маркерами: split()
+отделяет общую для всех пользователей страницу от фрагментов, а fill()
+вставляет в неё фрагменты для текущего запроса.
+"""
+import base64
+import json
+import re
+
+from django.template.loader import render_to_string
+
+_renderers = {}
+
+_HOLE = re.compile(
+    r'<!--hole:(?P<name>\w+):(?P<params>[\w=-]*)-->'
+    r'(?P<content>.*?)<!--/hole-->',
+    re.DOTALL,
+)
+_PLACEHOLDER = re.compile(r'<!--hole:(?P<name>\w+):(?P<params>[\w=-]*)-->')
+
+
+def register(name):
+    """Регистрирует функцию, рендерящую дырку name."""
+    def decorator(func):
+        _renderers[name] = func
+        return func
+    return decorator
+
+
+def _encode(params):
+    data = json.dumps(params, sort_keys=True, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def _decode(token):
+    return json.loads(base64.urlsafe_b64decode(token.encode()))
+
+
+def render(request, name, **params):
+    """Фрагмент для запроса; с маркерами, если запрос собирает дырки."""
+    html = _renderers[name](request, **params)
+    if not getattr(request, 'collect_holes', False):
+        return html
+    return f'<!--hole:{name}:{_encode(params)}-->{html}<!--/hole-->'
+
+
+def split(content):
+    """(общая страница с метками на месте дырок, страница без маркеров)."""
+    shared = _HOLE.sub(
+        lambda match: f'<!--hole:{match["name"]}:{match["params"]}-->',
+        content,
+    )
+    personal = _HOLE.sub(lambda match: match['content'], content)
+    return shared, personal
+
+
+def fill(request, shared):
+    """Вставляет в общую страницу фрагменты для текущего запроса."""
+    return _PLACEHOLDER.sub(
+        lambda match: _renderers[match['name']](
+            request, **_decode(match['params'])),
+        shared,
+    )
+
+
+@register('header')
+def header(request):
+    return render_to_string('includes/header.html', request=request)
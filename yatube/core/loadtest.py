@@ -0,0 +1,463 @@
+import asyncio
+import http.client
+import io
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import close_old_connections
+from django.test import Client
+
+PERCENTILES = (50, 95, 99)
+READ = 'read'
+WRITE = 'write'
+ANYONE = 'anyone'
+USER = 'user'
+ANONYMOUS = 'anonymous'
+_QUERIES = re.compile(r'sql;[^,]*desc="(\d+) queries"')
+
+
+class Route:
+    """Маршрут сценария нагрузки.
+
+    build(rng, session) возвращает (метод, путь, данные формы) или None,
+    если для этой сессии запрос построить нельзя.
+    """
+
+    def __init__(self, name, build, weight=1, kind=READ, audience=ANYONE):
+        self.name = name
+        self.build = build
+        self.weight = weight
+        self.kind = kind
+        self.audience = audience
+
+    def allowed(self, session):
+        if self.audience == USER:
+            return session.user is not None
+        if self.audience == ANONYMOUS:
+            return session.user is None
+        return True
+
+
+class Session:
+    """Посетитель: пользователь (или None) и его cookies."""
+
+    def __init__(self, user=None, cookies=None, **extra):
+        self.user = user
+        self.cookies = dict(cookies or {})
+        self.__dict__.update(extra)
+
+
+def queries_from(server_timing):
+    """Число запросов к базе из заголовка Server-Timing или None."""
+    match = _QUERIES.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+class ClientTransport:
+    """Вызывает WSGI-приложение в том же процессе, без сокетов."""
+
+    def request(self, method, path, data, cookies):
+        client = Client(enforce_csrf_checks=True)
+        client.cookies = SimpleCookie(cookies)
+        if method == 'POST':
+            response = client.post(path, data)
+        else:
+            response = client.get(path, data)
+        return response.status_code, response.get('Server-Timing')
+
+
+class HTTPTransport:
+    """Ходит на сервер по HTTP, держа по соединению на поток."""
+
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.prefix = url.path.rstrip('/')
+        self.local = threading.local()
+
+    def connection(self):
+        if getattr(self.local, 'connection', None) is None:
+            self.local.connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=30)
+        return self.local.connection
+
+    def request(self, method, path, data, cookies):
+        headers = {'Cookie': '; '.join(
+            f'{name}={value}' for name, value in cookies.items())}
+        body = None
+        path = self.prefix + path
+        if method == 'POST':
+            body = urlencode(data or {})
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif data:
+            path = f'{path}?{urlencode(data)}'
+        try:
+            connection = self.connection()
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.local.connection = None
+            raise
+        if response.getheader('Connection', '').lower() == 'close':
+            self.local.connection = None
+        return response.status, response.getheader('Server-Timing')
+
+
+def _request_parts(method, path, data, cookies):
+    """Строка запроса, тело и заголовки для прямого вызова приложения."""
+    query, body = '', b''
+    headers = {'cookie': '; '.join(
+        f'{name}={value}' for name, value in cookies.items())}
+    if method == 'POST':
+        body = urlencode(data or {}).encode()
+        headers['content-type'] = 'application/x-www-form-urlencoded'
+        headers['content-length'] = str(len(body))
+    elif data:
+        query = urlencode(data)
+    return query, body, headers
+
+
+class WSGITransport:
+    """Вызывает WSGI-приложение напрямую в потоке клиента, как
+    многопоточный WSGI-сервер, но без сокетов."""
+
+    def __init__(self, application):
+        self.application = application
+
+    def request(self, method, path, data, cookies):
+        query, body, headers = _request_parts(method, path, data, cookies)
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in headers.items():
+            key = name.upper().replace('-', '_')
+            if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                key = f'HTTP_{key}'
+            environ[key] = value
+        started = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            started['status'] = int(status.split()[0])
+            started['headers'] = dict(response_headers)
+
+        result = self.application(environ, start_response)
+        try:
+            for _ in result:
+                pass
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return started['status'], started['headers'].get('Server-Timing')
+
+
+class ASGITransport:
+    """Вызывает ASGI-приложение в одном цикле событий на все потоки
+    клиента, как однопроцессный ASGI-сервер, но без сокетов."""
+
+    def __init__(self, application):
+        self.application = application
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def request(self, method, path, data, cookies):
+        return asyncio.run_coroutine_threadsafe(
+            self.call(method, path, data, cookies), self.loop).result()
+
+    async def call(self, method, path, data, cookies):
+        query, body, headers = _request_parts(method, path, data, cookies)
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [
+                (b'host', b'testserver'),
+                *((name.encode(), value.encode())
+                  for name, value in headers.items()),
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+        response = {}
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['headers'] = {
+                    name.decode().lower(): value.decode()
+                    for name, value in message['headers']
+                }
+
+        await self.application(scope, receive, send)
+        return response['status'], response['headers'].get('server-timing')
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host='127.0.0.1', port=0):
+    """Запускает приложение на локальном многопоточном сервере.
+
+    Возвращает сервер и его адрес; остановка — server.shutdown().
+    """
+    server = ThreadedWSGIServer((host, port), QuietRequestHandler)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_port}'
+
+
+def percentile(ordered, rank):
+    """Процентиль по методу ближайшего ранга."""
+    if not ordered:
+        return None
+    index = max(0, -(-len(ordered) * rank // 100) - 1)
+    return ordered[index]
+
+
+class LoadTest:
+    """Гоняет сценарий в concurrency потоков, пока не истечёт duration
+    секунд или не будет отправлено requests запросов."""
+
+    def __init__(self, transport, routes, sessions, concurrency=8,
+                 duration=10.0, requests=None, write_ratio=0.1, seed=0):
+        self.transport = transport
+        self.routes = routes
+        self.sessions = sessions
+        self.concurrency = concurrency
+        self.duration = duration
+        self.requests = requests
+        self.write_ratio = write_ratio
+        self.seed = seed
+        self.samples = []
+        self.lock = threading.Lock()
+        self.sent = 0
+
+    def claim(self):
+        with self.lock:
+            if self.requests is not None and self.sent >= self.requests:
+                return False
+            self.sent += 1
+            return True
+
+    def pick(self, rng):
+        session = rng.choice(self.sessions)
+        kind = WRITE if rng.random() < self.write_ratio else READ
+        routes = [route for route in self.routes
+                  if route.kind == kind and route.allowed(session)]
+        if not routes:
+            return session, None
+        route = rng.choices(
+            routes, weights=[route.weight for route in routes])[0]
+        return session, route
+
+    def worker(self, number, deadline):
+        rng = random.Random(f'{self.seed}-{number}')
+        samples = []
+        while time.monotonic() < deadline:
+            session, route = self.pick(rng)
+            request = route and route.build(rng, session)
+            if request is None:
+                continue
+            if not self.claim():
+                break
+            method, path, data = request
+            started = time.perf_counter()
+            try:
+                status, timing = self.transport.request(
+                    method, path, data, session.cookies)
+            except Exception:
+                status, timing = None, None
+            elapsed = time.perf_counter() - started
+            samples.append((route.name, status, elapsed, queries_from(timing)))
+        with self.lock:
+            self.samples += samples
+
+    def run(self):
+        started = time.monotonic()
+        deadline = started + self.duration
+        if self.concurrency == 1:
+            self.worker(0, deadline)
+        else:
+            threads = [
+                threading.Thread(target=self.run_worker, args=(n, deadline))
+                for n in range(self.concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return summarize(self.samples, time.monotonic() - started)
+
+    def run_worker(self, number, deadline):
+        try:
+            self.worker(number, deadline)
+        finally:
+            close_old_connections()
+
+
+def _stats(samples, elapsed):
+    latencies = sorted(sample[2] * 1000 for sample in samples)
+    statuses = defaultdict(int)
+    for _, status, _, _ in samples:
+        statuses[str(status)] += 1
+    queries = [sample[3] for sample in samples if sample[3] is not None]
+    errors = sum(1 for _, status, _, _ in samples
+                 if status is None or status >= 500)
+    stats = {
+        'requests': len(samples),
+        'errors': errors,
+        'rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'max_ms': round(latencies[-1], 2),
+        'queries': (round(sum(queries) / len(queries), 2)
+                    if queries else None),
+        'statuses': dict(statuses),
+    }
+    for rank in PERCENTILES:
+        stats[f'p{rank}_ms'] = round(percentile(latencies, rank), 2)
+    return stats
+
+
+def summarize(samples, elapsed):
+    """Сводка по маршрутам и в целом, пригодная для JSON."""
+    by_route = defaultdict(list)
+    for sample in samples:
+        by_route[sample[0]].append(sample)
+    return {
+        'duration': round(elapsed, 3),
+        'total': _stats(samples, elapsed) if samples else None,
+        'routes': {
+            name: _stats(route_samples, elapsed)
+            for name, route_samples in sorted(by_route.items())
+        },
+    }
+
+
+def _row(name, stats):
+    return [
+        name, str(stats['requests']), str(stats['errors']),
+        f'{stats["rps"]:.1f}',
+        *(f'{stats[f"p{rank}_ms"]:.1f}' for rank in PERCENTILES),
+        '-' if stats['queries'] is None else f'{stats["queries"]:.1f}',
+    ]
+
+
+def _table(rows):
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return '\n'.join(
+        '  '.join(cell.ljust(width) if i == 0 else cell.rjust(width)
+                  for i, (cell, width) in enumerate(zip(row, widths)))
+        for row in rows
+    )
+
+
+def report(result):
+    """Таблица задержек по маршрутам, миллисекунды."""
+    rows = [['route', 'requests', 'errors', 'rps',
+             *(f'p{rank}' for rank in PERCENTILES), 'queries']]
+    rows += [_row(name, stats) for name, stats in result['routes'].items()]
+    if result['total']:
+        rows.append(_row('total', result['total']))
+    return _table(rows)
+
+
+def _change(old, new):
+    if old is None or new is None:
+        return '-'
+    if not old:
+        return f'{new:.1f}'
+    return f'{new:.1f} ({(new - old) / old:+.0%})'
+
+
+def compare(old, new):
+    """Сравнение двух прогонов: значения нового и изменение к старому."""
+    rows = [['route', 'rps', *(f'p{rank}' for rank in PERCENTILES),
+             'queries']]
+    names = sorted(set(old['routes']) | set(new['routes']))
+    pairs = [(name, old['routes'].get(name), new['routes'].get(name))
+             for name in names]
+    pairs.append(('total', old['total'], new['total']))
+    for name, before, after in pairs:
+        if not before or not after:
+            continue
+        rows.append([name] + [
+            _change(before[field], after[field])
+            for field in ('rps', *(f'p{rank}_ms' for rank in PERCENTILES),
+                          'queries')
+        ])
+    return _table(rows)
+
+
+def concurrency_report(results):
+    """Таблица пропускной способности и задержек приложений по уровням
+    конкурентности: results — {приложение: {конкурентность: прогон}}."""
+    apps = list(results)
+    levels = sorted({level for runs in results.values() for level in runs})
+    rows = [['concurrency'] + [
+        f'{app} {column}' for app in apps
+        for column in ('rps', 'p50', 'p95', 'p99', 'errors')
+    ]]
+    for level in levels:
+        row = [str(level)]
+        for app in apps:
+            total = (results[app].get(level) or {}).get('total')
+            if not total:
+                row += ['-'] * 5
+                continue
+            row += [
+                f'{total["rps"]:.1f}',
+                *(f'{total[f"p{rank}_ms"]:.1f}' for rank in PERCENTILES),
+                str(total['errors']),
+            ]
+        rows.append(row)
+    return _table(rows)
+
+
+def save(result, path):
+    with open(path, 'w') as file:
+        json.dump(result, file, indent=2, ensure_ascii=False)
+
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)
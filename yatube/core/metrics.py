@@ -0,0 +1,275 @@
+import atexit
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+
+# Верхние границы корзин гистограммы задержек, секунды.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIX = 'yatube'
+UNRESOLVED = 'unresolved'
+# Счётчики событий вне запросов: имя -> описание.
+COUNTERS = {
+    'cache_recomputes': (
+        'Пересчёты дорогих значений кеша по исходу; stale и waited — '
+        'пересчёты, отменённые из-за чужого пересчёта.'),
+}
+
+
+def _empty_view():
+    return {
+        'buckets': [0] * (len(BUCKETS) + 1),
+        'count': 0,
+        'sum': 0.0,
+        'statuses': defaultdict(int),
+        'queries': 0,
+        'cache_hits': 0,
+        'cache_misses': 0,
+    }
+
+
+class Registry:
+    """Метрики одного процесса.
+
+    Если задан METRICS_DIR, процесс периодически сбрасывает их в свой
+    файл, а при выдаче метрик файлы всех воркеров суммируются. Файл
+    удаляется при выходе процесса; файлы упавших воркеров удаляет
+    collect.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.name = f'metrics-{self.pid}-{uuid.uuid4().hex[:8]}.json'
+        self.views = defaultdict(_empty_view)
+        self.counters = defaultdict(lambda: defaultdict(int))
+        self.lock = threading.Lock()
+        self.flushed = 0.0
+
+    def observe(self, view, status, duration, queries=0, cache_hits=0,
+                cache_misses=0):
+        with self.lock:
+            data = self.views[view or UNRESOLVED]
+            data['buckets'][bisect.bisect_left(BUCKETS, duration)] += 1
+            data['count'] += 1
+            data['sum'] += duration
+            data['statuses'][str(status)] += 1
+            data['queries'] += queries
+            data['cache_hits'] += cache_hits
+            data['cache_misses'] += cache_misses
+        if time.monotonic() - self.flushed >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def count(self, name, outcome, amount=1):
+        with self.lock:
+            self.counters[name][outcome] += amount
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(
+                {'views': self.views, 'counters': self.counters}))
+
+    def flush(self):
+        """Атомарно записывает метрики процесса в его файл."""
+        directory = settings.METRICS_DIR
+        self.flushed = time.monotonic()
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temp, os.path.join(directory, self.name))
+
+    def remove(self):
+        """Удаляет файл процесса. После fork обработчик atexit
+        наследуется, поэтому чужой файл не трогаем."""
+        if os.getpid() != self.pid or not settings.METRICS_DIR:
+            return
+        try:
+            os.remove(os.path.join(settings.METRICS_DIR, self.name))
+        except FileNotFoundError:
+            pass
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Реестр текущего процесса; после fork воркер заводит свой."""
+    global _registry
+    with _registry_lock:
+        if _registry is None or _registry.pid != os.getpid():
+            _registry = Registry()
+            atexit.register(_registry.remove)
+        return _registry
+
+
+def _alive(name):
+    """Жив ли процесс, записавший файл метрик name."""
+    try:
+        pid = int(name.split('-')[1])
+    except (IndexError, ValueError):
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def observe(profile, status):
+    get_registry().observe(
+        profile.view_name, status, profile.total,
+        queries=profile.sql_count,
+        cache_hits=profile.cache_hits,
+        cache_misses=profile.cache_misses,
+    )
+
+
+def count(name, outcome, amount=1):
+    """Увеличивает счётчик name из COUNTERS с меткой outcome."""
+    get_registry().count(name, outcome, amount)
+
+
+def _merge(total, snapshot):
+    for name, outcomes in snapshot['counters'].items():
+        for outcome, amount in outcomes.items():
+            total['counters'][name][outcome] += amount
+    for view, data in snapshot['views'].items():
+        merged = total['views'][view]
+        merged['buckets'] = [
+            a + b for a, b in zip(merged['buckets'], data['buckets'])
+        ]
+        for field in ('count', 'sum', 'queries', 'cache_hits',
+                      'cache_misses'):
+            merged[field] += data[field]
+        for status, count in data['statuses'].items():
+            merged['statuses'][status] += count
+
+
+def collect():
+    """Метрики всех воркеров: {'views': {view: данные},
+    'counters': {имя: {исход: число}}}."""
+    registry = get_registry()
+    registry.flush()
+    total = {
+        'views': defaultdict(_empty_view),
+        'counters': defaultdict(lambda: defaultdict(int)),
+    }
+    directory = settings.METRICS_DIR
+    if not directory:
+        _merge(total, registry.snapshot())
+        return total
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(directory, name)
+        if not _alive(name):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            continue
+        try:
+            with open(path) as file:
+                _merge(total, json.load(file))
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+def _labels(**labels):
+    def escape(value):
+        return (str(value).replace('\\', r'\\').replace('"', r'\"')
+                .replace('\n', r'\n'))
+    return '{' + ','.join(
+        f'{key}="{escape(value)}"' for key, value in labels.items()
+    ) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(metrics):
+    """Метрики в текстовом формате Prometheus."""
+    views = metrics['views']
+    name = f'{PREFIX}_request_duration_seconds'
+    lines = [
+        f'# HELP {name} Время обработки запроса по view-функциям.',
+        f'# TYPE {name} histogram',
+    ]
+    for view, data in sorted(views.items()):
+        cumulative = 0
+        bounds = [_number(bound) for bound in BUCKETS] + ['+Inf']
+        for bound, count in zip(bounds, data['buckets']):
+            cumulative += count
+            lines.append(
+                f'{name}_bucket{_labels(view=view, le=bound)} {cumulative}')
+        lines.append(f'{name}_sum{_labels(view=view)} {data["sum"]!r}')
+        lines.append(f'{name}_count{_labels(view=view)} {data["count"]}')
+
+    name = f'{PREFIX}_responses_total'
+    lines += [
+        f'# HELP {name} Ответы по view-функциям и кодам статуса.',
+        f'# TYPE {name} counter',
+    ]
+    for view, data in sorted(views.items()):
+        for status, count in sorted(data['statuses'].items()):
+            lines.append(
+                f'{name}{_labels(view=view, status=status)} {count}')
+
+    name = f'{PREFIX}_db_queries_total'
+    lines += [
+        f'# HELP {name} Запросы к базе данных по view-функциям.',
+        f'# TYPE {name} counter',
+    ]
+    for view, data in sorted(views.items()):
+        lines.append(f'{name}{_labels(view=view)} {data["queries"]}')
+
+    name = f'{PREFIX}_cache_requests_total'
+    lines += [
+        f'# HELP {name} Обращения к кешу по view-функциям.',
+        f'# TYPE {name} counter',
+    ]
+    for view, data in sorted(views.items()):
+        for result, field in (('hit', 'cache_hits'),
+                              ('miss', 'cache_misses')):
+            lines.append(
+                f'{name}{_labels(view=view, result=result)} {data[field]}')
+
+    name = f'{PREFIX}_cache_hit_ratio'
+    lines += [
+        f'# HELP {name} Доля попаданий в кеш по view-функциям.',
+        f'# TYPE {name} gauge',
+    ]
+    for view, data in sorted(views.items()):
+        requests = data['cache_hits'] + data['cache_misses']
+        if requests:
+            ratio = data['cache_hits'] / requests
+            lines.append(f'{name}{_labels(view=view)} {ratio!r}')
+    lines += _render_counters(metrics['counters'])
+    return '\n'.join(lines) + '\n'
+
+
+def _render_counters(counters):
+    lines = []
+    for counter, description in COUNTERS.items():
+        name = f'{PREFIX}_{counter}_total'
+        lines += [
+            f'# HELP {name} {description}',
+            f'# TYPE {name} counter',
+        ]
+        outcomes = counters.get(counter, {})
+        for outcome, amount in sorted(outcomes.items()):
+            lines.append(f'{name}{_labels(outcome=outcome)} {amount}')
+    return lines
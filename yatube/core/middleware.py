@@ -0,0 +1,75 @@
+import asyncio
+
+from . import metrics, profiling
+
+
+class HybridMiddleware:
+    """Основа middleware, работающего и в WSGI, и в ASGI.
+
+    В асинхронной цепочке вызывается acall(): запрос не уходит целиком
+    в общий поток, куда Django переключает синхронные middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Как в django.utils.deprecation.MiddlewareMixin: по этой
+            # метке обработчик считает экземпляр корутинной функцией.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.acall(request)
+        return self.call(request)
+
+    def call(self, request):
+        raise NotImplementedError
+
+    async def acall(self, request):
+        raise NotImplementedError
+
+
+class ServerTimingMiddleware(HybridMiddleware):
+    """Отдаёт профиль запроса в заголовке Server-Timing и с заданной
+    вероятностью пишет его в лог вместе с именем view-функции."""
+
+    def call(self, request):
+        with profiling.profile_request() as profile:
+            response = self.get_response(request)
+        return self.finish(request, profile, response)
+
+    async def acall(self, request):
+        with profiling.profile_request() as profile:
+            response = await self.get_response(request)
+        return self.finish(request, profile, response)
+
+    def finish(self, request, profile, response):
+        match = request.resolver_match
+        profile.view_name = match.view_name if match else ''
+        request.profile = profile
+        response['Server-Timing'] = profile.server_timing()
+        profiling.log_sampled(profile)
+        return response
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Учитывает профиль запроса в гистограммах и счётчиках core.metrics.
+
+    Должен стоять перед ServerTimingMiddleware, чтобы получить
+    завершённый профиль.
+    """
+
+    def call(self, request):
+        return self.observe(request, self.get_response(request))
+
+    async def acall(self, request):
+        return self.observe(request, await self.get_response(request))
+
+    def observe(self, request, response):
+        profile = getattr(request, 'profile', None)
+        if profile is not None:
+            metrics.observe(profile, response.status_code)
+        return response
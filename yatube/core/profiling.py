@@ -0,0 +1,112 @@
+import contextvars
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from . import executor
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """Счётчики одного запроса: SQL, шаблоны, кеш и общее время."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = None
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.view_name = ''
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self):
+        return ', '.join([
+            f'sql;dur={self.sql_time * 1000:.1f};'
+            f'desc="{self.sql_count} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="hits={self.cache_hits} misses={self.cache_misses}"',
+            f'total;dur={self.total * 1000:.1f}',
+        ])
+
+    def as_dict(self):
+        return {
+            'view': self.view_name,
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'template_ms': round(self.template_time * 1000, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'total_ms': round(self.total * 1000, 2),
+        }
+
+
+def current():
+    """Профиль текущего запроса или None вне запроса."""
+    return _current.get()
+
+
+def _sql_timer(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.sql_count += 1
+        profile.sql_time += time.perf_counter() - started
+
+
+@contextmanager
+def profile_request():
+    """Собирает профиль запроса, выполняемого внутри блока."""
+    profile = RequestProfile()
+    token = _current.set(profile)
+    try:
+        with executor.execute_wrapper(_sql_timer):
+            yield profile
+    finally:
+        profile.finish()
+        _current.reset(token)
+
+
+@contextmanager
+def template_timer():
+    """Время рендера внешнего шаблона; вложенные рендеры не суммируются."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    profile.template_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.template_depth -= 1
+        if not profile.template_depth:
+            profile.template_time += time.perf_counter() - started
+
+
+def record_cache(hits=0, misses=0):
+    profile = _current.get()
+    if profile is not None:
+        profile.cache_hits += hits
+        profile.cache_misses += misses
+
+
+def log_sampled(profile):
+    rate = settings.SERVER_TIMING_LOG_SAMPLE_RATE
+    if rate and random.random() < rate:
+        logger.info(json.dumps(profile.as_dict(), ensure_ascii=False))
@@ -0,0 +1,60 @@
+import asyncio
+import functools
+import logging
+
+from django.conf import settings
+
+from . import executor
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class _Counter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _check(view, counter, limit):
+    if counter.count > limit:
+        message = (f'{view.__module__}.{view.__qualname__}: '
+                   f'{counter.count} SQL-запросов при бюджете {limit}')
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def query_budget(limit):
+    """Ограничивает число SQL-запросов view-функции.
+
+    При QUERY_BUDGET_STRICT превышение бюджета — исключение, иначе
+    предупреждение в лог. Бюджет доступен как view.query_budget.
+    Асинхронная view считает запросы, выполненные через core.executor.run.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                counter = _Counter()
+                with executor.execute_wrapper(counter):
+                    response = await view(request, *args, **kwargs)
+                _check(view, counter, limit)
+                return response
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                counter = _Counter()
+                with executor.execute_wrapper(counter):
+                    response = view(request, *args, **kwargs)
+                _check(view, counter, limit)
+                return response
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
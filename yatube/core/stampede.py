@@ -0,0 +1,119 @@
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+from . import metrics
+
+LOCK_PREFIX = 'lock'
+# Сколько секунд держится блокировка, если пересчитавший воркер упал.
+LOCK_TIMEOUT = 30
+# Сколько секунд после срока годности значение ещё можно отдавать,
+# пока его пересчитывает другой воркер.
+STALE_TIMEOUT = 60
+# Сколько секунд ждать чужого пересчёта, когда отдать нечего.
+WAIT = 1.0
+POLL_INTERVAL = 0.05
+# Чем больше beta, тем раньше начинается досрочный пересчёт.
+BETA = 1.0
+METRIC = 'cache_recomputes'
+
+
+def lock_key(key):
+    return f'{LOCK_PREFIX}:{key}'
+
+
+def acquire(key, timeout=LOCK_TIMEOUT):
+    """Берёт блокировку пересчёта key; True, если она досталась нам."""
+    return cache.add(lock_key(key), True, timeout)
+
+
+def release(key):
+    cache.delete(lock_key(key))
+
+
+def _should_refresh(delta, expires, beta):
+    """Вероятностный досрочный пересчёт (XFetch): чем ближе срок
+    и чем дольше считается значение, тем вероятнее пересчёт."""
+    return time.time() - delta * beta * math.log(
+        1.0 - random.random()) >= expires
+
+
+def _compute(keys, compute_many, timeout, stale_timeout):
+    started = time.monotonic()
+    values = compute_many(keys)
+    delta = time.monotonic() - started
+    expires = time.time() + timeout
+    cache.set_many({
+        key: (value, delta, expires)
+        for key, value in values.items() if value is not None
+    }, timeout + stale_timeout)
+    return values
+
+
+def _wait(key, compute_many, timeout, stale_timeout, wait):
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            metrics.count(METRIC, 'waited')
+            return entry[0]
+    metrics.count(METRIC, 'timeout')
+    return _compute([key], compute_many, timeout, stale_timeout).get(key)
+
+
+def get_many_or_set(keys, compute_many, timeout,
+                    stale_timeout=STALE_TIMEOUT, beta=BETA, wait=WAIT):
+    """Значения ключей из кеша, недостающие — из compute_many.
+
+    compute_many(keys) возвращает {ключ: значение} для переданных
+    ключей. Попадания читаются одним get_many; промахи пересчитывает
+    один воркер — тот, кому досталась блокировка ключа, — одним вызовом
+    compute_many на все свои ключи. Пересчёт начинается немного раньше
+    срока (XFetch); остальные воркеры тем временем отдают устаревшее
+    значение, а если его нет — ждут до wait секунд. Результат None не
+    кешируется. Исходы пересчётов видны в метрике cache_recomputes:
+    stale и waited — пересчёты, которых удалось избежать.
+    """
+    entries = cache.get_many(keys)
+    found = {}
+    refresh = {}
+    for key in keys:
+        entry = entries.get(key)
+        if entry is not None and not _should_refresh(*entry[1:], beta):
+            found[key] = entry[0]
+        else:
+            refresh[key] = entry
+    locked = [key for key in refresh if acquire(key)]
+    if locked:
+        try:
+            for key in locked:
+                entry = refresh[key]
+                metrics.count(METRIC, 'early' if entry is not None
+                              and time.time() < entry[2] else 'computed')
+            found.update(
+                _compute(locked, compute_many, timeout, stale_timeout))
+        finally:
+            cache.delete_many([lock_key(key) for key in locked])
+    for key, entry in refresh.items():
+        if key in locked:
+            continue
+        if entry is not None:
+            metrics.count(METRIC, 'stale')
+            found[key] = entry[0]
+        else:
+            found[key] = _wait(
+                key, compute_many, timeout, stale_timeout, wait)
+    return found
+
+
+def get_or_set(key, compute, timeout, stale_timeout=STALE_TIMEOUT,
+               beta=BETA, wait=WAIT):
+    """get_many_or_set для одного ключа: значение из кеша или compute(),
+    посчитанное одним воркером."""
+    return get_many_or_set(
+        [key], lambda keys: {key: compute()}, timeout,
+        stale_timeout=stale_timeout, beta=beta, wait=wait,
+    )[key]
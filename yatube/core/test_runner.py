@@ -0,0 +1,28 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Запускает тесты с файлами кешей во временном каталоге, чтобы
+    прогоны не видели кеш разработки и друг друга."""
+
+    def setup_test_environment(self, **kwargs):
+        self.cache_dir = tempfile.mkdtemp(prefix='yatube-cache-')
+        caches = {}
+        for alias, params in settings.CACHES.items():
+            params = dict(params)
+            if params['BACKEND'] == 'core.cache_backends.TwoTierCache':
+                params['LOCATION'] = f'{self.cache_dir}/{alias}.sqlite3'
+            caches[alias] = params
+        self.cache_override = override_settings(CACHES=caches)
+        self.cache_override.enable()
+        super().setup_test_environment(**kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        self.cache_override.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
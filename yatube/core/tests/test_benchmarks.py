@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core import benchmarks
+
+User = get_user_model()
+
+
+class BenchmarkTests(TestCase):
+    def test_measure_counts_queries(self):
+        """Замер возвращает время и число запросов одного вызова."""
+        result = benchmarks.measure(
+            lambda: list(User.objects.all()), repeat=3, cold=True)
+        self.assertEqual(result['queries'], 1)
+        self.assertLessEqual(result['min_ms'], result['median_ms'])
+
+    def test_regressions(self):
+        """Ухудшение ищется с поправкой на скорость машины."""
+        baseline = {
+            'calibration_ms': 10.0,
+            'benchmarks': {
+                'view': {'min_ms': 10.0, 'median_ms': 11.0, 'queries': 2},
+            },
+        }
+
+        def results(min_ms, queries, calibration=10.0):
+            return {
+                'calibration_ms': calibration,
+                'benchmarks': {'view': {
+                    'min_ms': min_ms, 'median_ms': min_ms,
+                    'queries': queries,
+                }},
+            }
+
+        self.assertEqual(
+            benchmarks.regressions(baseline, results(12.0, 2), 0.25), [])
+        self.assertEqual(
+            len(benchmarks.regressions(baseline, results(13.0, 3), 0.25)), 2)
+        self.assertEqual(benchmarks.regressions(
+            baseline, results(24.0, 2, calibration=20.0), 0.25), [])
@@ -0,0 +1,66 @@
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from core.cache_backends import TwoTierCache, _LocalTier
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.cache = self.worker()
+        self.other = self.worker()
+
+    def worker(self):
+        """Экземпляр кеша со своим L1, как в отдельном воркере."""
+        cache = TwoTierCache(
+            f'{self.directory}/cache.sqlite3',
+            {'OPTIONS': {'SYNC_INTERVAL': 0}},
+        )
+        cache._tier = _LocalTier()
+        return cache
+
+    def test_shared_between_workers(self):
+        """Запись одного воркера видна другому."""
+        self.cache.set_many({'a': 1, 'b': [2]})
+        self.assertEqual(self.other.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': [2]})
+
+    def test_invalidation_reaches_other_workers(self):
+        """Изменение и удаление сбрасывают L1 других воркеров."""
+        self.cache.set('key', 'old')
+        self.assertEqual(self.other.get('key'), 'old')
+        self.cache.set('key', 'new')
+        self.assertEqual(self.other.get('key'), 'new')
+        self.cache.delete('key')
+        self.assertIsNone(self.other.get('key'))
+        self.cache.set('key', 'again')
+        self.other.get('key')
+        self.cache.clear()
+        self.assertIsNone(self.other.get('key'))
+
+    def test_l1_serves_reads_between_syncs(self):
+        """Между синхронизациями чтение не обращается к L2."""
+        self.other.sync_interval = 60
+        self.cache.set('key', 'old')
+        self.assertEqual(self.other.get('key'), 'old')
+        self.cache.set('key', 'new')
+        self.assertEqual(self.other.get('key'), 'old')
+
+    def test_add_incr_and_expiry(self):
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.other.add('counter', 5))
+        self.assertEqual(self.other.incr('counter'), 2)
+        self.assertEqual(self.cache.get('counter'), 2)
+        self.cache.set('expired', 1, timeout=-1)
+        self.assertIsNone(self.other.get('expired'))
+        self.assertTrue(self.other.add('expired', 2))
+
+    def test_l1_size_limited(self):
+        self.cache.l1_max_entries = 2
+        self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(list(self.cache._tier.entries),
+                         [self.cache.make_key(key) for key in 'bc'])
+        self.assertEqual(self.cache.get('a'), 1)
@@ -0,0 +1,69 @@
+from django.test import SimpleTestCase
+
+from core import loadtest
+
+
+class LoadTestReportTests(SimpleTestCase):
+    def test_percentile(self):
+        """Процентили считаются по ближайшему рангу."""
+        values = list(range(1, 101))
+        self.assertEqual(loadtest.percentile(values, 50), 50)
+        self.assertEqual(loadtest.percentile(values, 99), 99)
+        self.assertEqual(loadtest.percentile([7], 95), 7)
+        self.assertIsNone(loadtest.percentile([], 50))
+
+    def test_queries_from_server_timing(self):
+        """Число запросов берётся из заголовка Server-Timing."""
+        header = 'sql;dur=1.2;desc="3 queries", total;dur=5.0'
+        self.assertEqual(loadtest.queries_from(header), 3)
+        self.assertIsNone(loadtest.queries_from(None))
+
+    def test_summary_and_comparison(self):
+        """Сводка по маршрутам сравнивается с прошлым прогоном."""
+        old = loadtest.summarize(
+            [('index', 200, 0.010, 1), ('index', 500, 0.030, 2),
+             ('post', 200, 0.020, None)], 1.0)
+        self.assertEqual(old['routes']['index']['errors'], 1)
+        self.assertEqual(old['routes']['index']['queries'], 1.5)
+        self.assertIsNone(old['routes']['post']['queries'])
+        new = loadtest.summarize([('index', 200, 0.005, 1)], 1.0)
+        table = loadtest.compare(old, new)
+        self.assertIn('5.0 (-75%)', table)
+        self.assertNotIn('post', table)
+
+
+def wsgi_app(environ, start_response):
+    body = f'{environ["REQUEST_METHOD"]} {environ["QUERY_STRING"]}'
+    timing = f'sql;dur=1;desc="2 queries", {environ["HTTP_COOKIE"]}'
+    start_response('201 Created', [('Server-Timing', timing)])
+    return [body.encode()]
+
+
+async def asgi_app(scope, receive, send):
+    message = await receive()
+    headers = dict(scope['headers'])
+    await send({
+        'type': 'http.response.start', 'status': 201,
+        'headers': [(b'Server-Timing', headers[b'cookie'] + message['body'])],
+    })
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+class TransportTests(SimpleTestCase):
+    def test_wsgi_transport(self):
+        transport = loadtest.WSGITransport(wsgi_app)
+        status, timing = transport.request(
+            'GET', '/', {'q': 'x'}, {'sessionid': 'abc'})
+        self.assertEqual(status, 201)
+        self.assertEqual(loadtest.queries_from(timing), 2)
+        self.assertIn('sessionid=abc', timing)
+
+    def test_asgi_transport(self):
+        transport = loadtest.ASGITransport(asgi_app)
+        try:
+            status, timing = transport.request(
+                'POST', '/', {'text': 'x'}, {'csrftoken': 't'})
+        finally:
+            transport.close()
+        self.assertEqual(status, 201)
+        self.assertEqual(timing, 'csrftoken=ttext=x')
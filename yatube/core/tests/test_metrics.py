@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+
+User = get_user_model()
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='MetricsUser')
+        cls.staff = User.objects.create_user(
+            username='MetricsStaff', is_staff=True)
+
+    def test_metrics_protected(self):
+        """Метрики недоступны без токена и прав сотрудника."""
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        with override_settings(METRICS_TOKEN='secret'):
+            response = self.client.get(
+                '/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_per_view(self):
+        """Гистограмма и счётчики собираются по имени view-функции."""
+        self.client.get(reverse('posts:index'))
+        self.client.force_login(self.staff)
+        content = self.client.get('/metrics/').content.decode()
+        for line in (
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"}',
+            'yatube_responses_total{view="posts:index",status="200"}',
+            'yatube_db_queries_total{view="posts:index"}',
+            'yatube_cache_requests_total{view="posts:index",result="miss"}',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, content)
+
+    def test_metrics_merged_across_workers(self):
+        """Файлы метрик разных воркеров суммируются."""
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(METRICS_DIR=directory):
+                for _ in range(2):
+                    worker = metrics.Registry()
+                    worker.observe('posts:profile', 200, 0.02, queries=3)
+                    worker.flush()
+                own = metrics.get_registry().snapshot()['views'].get(
+                    'posts:profile')
+                views = metrics.collect()['views']
+        own_count = own['count'] if own else 0
+        self.assertEqual(views['posts:profile']['count'], own_count + 2)
+        self.assertGreaterEqual(views['posts:profile']['queries'], 6)
+
+    def test_dead_workers_pruned(self):
+        """Файлы завершившихся воркеров удаляются и не суммируются."""
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        with tempfile.TemporaryDirectory() as directory:
+            dead = os.path.join(
+                directory, f'metrics-{process.pid}-0.json')
+            worker = metrics.Registry()
+            worker.observe('posts:group_list', 200, 0.01)
+            with open(dead, 'w') as file:
+                json.dump(worker.snapshot(), file)
+            with override_settings(METRICS_DIR=directory):
+                views = metrics.collect()['views']
+                self.assertNotIn('posts:group_list', views)
+                self.assertFalse(os.path.exists(dead))
+                worker.flush()
+                worker.remove()
+            self.assertNotIn(worker.name, os.listdir(directory))
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TimingUser')
+        Post.objects.create(author=cls.user, text='Timing text')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing_header(self):
+        """Заголовок Server-Timing содержит SQL, шаблоны, кеш и итог."""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for metric in ('sql;dur=', 'tpl;dur=', 'cache;desc=', 'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+        self.assertIn('hits=0', timing)
+        self.assertNotIn('hits=0', self.client.get(
+            reverse('posts:index'))['Server-Timing'])
+
+    def test_sampled_log_line(self):
+        """При выборке профиль пишется в лог с именем view-функции."""
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            with override_settings(SERVER_TIMING_LOG_SAMPLE_RATE=1.0):
+                self.client.get(reverse('posts:index'))
+        self.assertIn('"view": "posts:index"', logs.output[0])
@@ -0,0 +1,102 @@
+import threading
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from core import metrics, stampede
+
+
+class StampedeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f'value {self.calls}'
+
+    def recomputes(self):
+        return dict(metrics.get_registry().snapshot()['counters'].get(
+            stampede.METRIC, {}))
+
+    def test_single_lock_holder(self):
+        """Блокировку пересчёта получает только один воркер."""
+        self.assertTrue(stampede.acquire('key'))
+        self.assertFalse(stampede.acquire('key'))
+        stampede.release('key')
+        self.assertTrue(stampede.acquire('key'))
+
+    def test_value_cached(self):
+        """Значение считается один раз, пока не истёк срок."""
+        for _ in range(3):
+            value = stampede.get_or_set('key', self.compute, 60, beta=0)
+        self.assertEqual(value, 'value 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_concurrent_miss_computed_once(self):
+        """Одновременный промах пересчитывает один воркер, остальные
+        дожидаются его результата."""
+        started = threading.Event()
+        finish = threading.Event()
+
+        def slow():
+            started.set()
+            finish.wait(5)
+            return self.compute()
+
+        before = self.recomputes().get('waited', 0)
+        results = []
+        first = threading.Thread(target=lambda: results.append(
+            stampede.get_or_set('key', slow, 60)))
+        first.start()
+        started.wait(5)
+        second = threading.Thread(target=lambda: results.append(
+            stampede.get_or_set('key', self.compute, 60, wait=5)))
+        second.start()
+        finish.set()
+        first.join()
+        second.join()
+        self.assertEqual(results, ['value 1', 'value 1'])
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.recomputes()['waited'], before + 1)
+
+    def test_stale_served_while_locked(self):
+        """Пока другой воркер пересчитывает, отдаётся старое значение."""
+        stampede.get_or_set('key', self.compute, 0)
+        before = self.recomputes().get('stale', 0)
+        stampede.acquire('key')
+        value = stampede.get_or_set('key', self.compute, 60)
+        self.assertEqual(value, 'value 1')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.recomputes()['stale'], before + 1)
+        stampede.release('key')
+        self.assertEqual(
+            stampede.get_or_set('key', self.compute, 60), 'value 2')
+
+    def test_timeout_without_stale_value(self):
+        """Без старого значения воркер ждёт и считает сам."""
+        stampede.acquire('key')
+        value = stampede.get_or_set('key', self.compute, 60, wait=0.1)
+        self.assertEqual(value, 'value 1')
+
+    def test_early_refresh(self):
+        """При большом beta значение пересчитывается до срока."""
+        stampede.get_or_set('key', self.compute, 60)
+        before = self.recomputes().get('early', 0)
+        value = stampede.get_or_set('key', self.compute, 60, beta=1e12)
+        self.assertEqual(value, 'value 2')
+        self.assertEqual(self.recomputes()['early'], before + 1)
+
+    def test_many_computed_in_one_call(self):
+        """Промахи набора ключей считаются одним вызовом compute_many."""
+        batches = []
+
+        def compute_many(keys):
+            batches.append(sorted(keys))
+            return {key: key.upper() for key in keys}
+
+        stampede.get_many_or_set(['a'], compute_many, 60, beta=0)
+        values = stampede.get_many_or_set(
+            ['a', 'b', 'c'], compute_many, 60, beta=0)
+        self.assertEqual(values, {'a': 'A', 'b': 'B', 'c': 'C'})
+        self.assertEqual(batches, [['a'], ['b', 'c']])
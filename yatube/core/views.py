@@ -1,5 +1,12 @@
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from . import metrics as core_metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +22,18 @@ def csrf_failure(request, reason=''):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+def metrics(request):
+    """Метрики в формате Prometheus: для сотрудников или по токену
+    из заголовка Authorization: Bearer <METRICS_TOKEN>."""
+    token = settings.METRICS_TOKEN
+    header = request.headers.get('Authorization', '')
+    allowed = request.user.is_staff or bool(token) and hmac.compare_digest(
+        header, f'Bearer {token}')
+    if not allowed:
+        raise PermissionDenied
+    return HttpResponse(
+        core_metrics.render(core_metrics.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
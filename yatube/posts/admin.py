@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.db import connection
+from posts import search
 from posts.models import Comment, Follow, Group, Post
 
 
@@ -16,6 +18,17 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по индексу FTS5 вместо LIKE по тексту."""
+        if connection.vendor != 'sqlite' or not search_term.strip():
+            return super().get_search_results(
+                request, queryset, search_term)
+        if not search.match_expression(search_term):
+            # В запросе нет слов, а пустой MATCH — ошибка синтаксиса FTS5.
+            return queryset.none(), False
+        return queryset.filter(
+            pk__in=search.post_ids_subquery(search_term)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
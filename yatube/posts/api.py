@@ -0,0 +1,194 @@
+import functools
+
+from core.query_budget import query_budget
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+
+from . import stats, thumbnails, versions
+from .models import Comment, Group, Post, PostImageVariant
+from .paginator import CursorPaginator
+from .timeline import TimelineValuesPaginator
+from .views import (COMMENTS_QUANTITY, POSTS_QUANTITY, feed_scopes,
+                    group_scopes, post_scopes, profile_scopes)
+
+User = get_user_model()
+
+# Колонки поста, которые читает сериализатор: только они и выбираются.
+# Счётчик комментариев денормализован в посте и не стоит запроса, но
+# ETag списков его не учитывает: он меняется вместе со списком, а не с
+# любым комментарием на сайте. Точный счётчик — у отдельного поста.
+POST_FIELDS = (
+    'id', 'text', 'created', 'updated', 'image', 'comments_count',
+    'author__username', 'author__first_name', 'author__last_name',
+    'group__slug',
+)
+COMMENT_FIELDS = ('id', 'text', 'created', 'author__username')
+
+
+def error(detail, status):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def not_found():
+    """404 с телом JSON вместо HTML-шаблона get_object_or_404."""
+    return error('Не найдено.', 404)
+
+
+def login_required(view):
+    """login_required для API: вместо редиректа на форму входа — 403
+    с телом JSON."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error('Требуется вход на сайт.', 403)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def full_name(first_name, last_name):
+    return f'{first_name} {last_name}'.strip()
+
+
+def image_urls(rows):
+    """Превью и варианты картинок постов страницы двумя чтениями:
+    хранилище sorl и таблица вариантов."""
+    with_images = {row['id']: row['image'] for row in rows if row['image']}
+    if not with_images:
+        return {}, {}
+    previews = thumbnails.lookup_many(with_images.values())
+    variants = {}
+    for post_id, source, fmt, width, name in PostImageVariant.objects.filter(
+        post_id__in=with_images,
+    ).order_by('width').values_list(
+        'post_id', 'source', 'format', 'width', 'file',
+    ):
+        if source == with_images[post_id]:
+            variants.setdefault(post_id, []).append({
+                'format': fmt, 'width': width,
+                'url': default_storage.url(name),
+            })
+    return previews, variants
+
+
+def serialize_posts(rows):
+    """Словари для JSON прямо из строк values(), без объектов моделей."""
+    previews, variants = image_urls(rows)
+    result = []
+    for row in rows:
+        image = row['image']
+        preview = previews.get(image)
+        result.append({
+            'id': row['id'],
+            'text': row['text'],
+            'created': row['created'],
+            'updated': row['updated'],
+            'author': {
+                'username': row['author__username'],
+                'full_name': full_name(
+                    row['author__first_name'], row['author__last_name']),
+            },
+            'group': row['group__slug'],
+            'comments_count': row['comments_count'],
+            'image': default_storage.url(image) if image else None,
+            'thumbnail': preview.url if preview else None,
+            'variants': variants.get(row['id'], []),
+        })
+    return result
+
+
+def page_response(request, paginator, **extra):
+    page = paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    return JsonResponse({
+        **extra,
+        'results': serialize_posts(page.object_list),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+def posts_paginator(queryset):
+    return CursorPaginator(queryset.values(*POST_FIELDS), POSTS_QUANTITY)
+
+
+@query_budget(4)
+@versions.conditional(feed_scopes)
+def index(request):
+    return page_response(request, posts_paginator(Post.objects.all()))
+
+
+@query_budget(6)
+@versions.conditional(group_scopes)
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).values(
+        'id', 'slug', 'title', 'description').first()
+    if group is None:
+        return not_found()
+    return page_response(
+        request,
+        posts_paginator(Post.objects.filter(group_id=group.pop('id'))),
+        group=group,
+    )
+
+
+@query_budget(7)
+@versions.conditional(profile_scopes)
+def profile(request, username):
+    author = User.objects.select_related('stats').filter(
+        username=username).first()
+    if author is None:
+        return not_found()
+    author_stats = stats.for_user(author)
+    return page_response(
+        request,
+        posts_paginator(Post.objects.filter(author_id=author.pk)),
+        author={
+            'username': author.username,
+            'full_name': author.get_full_name(),
+            **{field: getattr(author_stats, field)
+               for field in stats.COUNTERS},
+        },
+    )
+
+
+def follow_scopes(request):
+    """Лента меняется с постами и с подписками пользователя (они
+    сдвигают штамп его автора)."""
+    return [versions.FEED, versions.author(request.user.pk)]
+
+
+@login_required
+@query_budget(6)
+@versions.conditional(follow_scopes)
+def follow_index(request):
+    return page_response(request, TimelineValuesPaginator(
+        request.user, POSTS_QUANTITY, POST_FIELDS))
+
+
+@query_budget(5)
+@versions.conditional(post_scopes)
+def post_detail(request, post_id):
+    rows = list(Post.objects.filter(pk=post_id).values(*POST_FIELDS))
+    if not rows:
+        return not_found()
+    comments = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).values(*COMMENT_FIELDS),
+        COMMENTS_QUANTITY, ordering=('created', 'id'),
+    ).get_page()
+    return JsonResponse({
+        'post': serialize_posts(rows)[0],
+        'comments': [
+            {
+                'id': comment['id'],
+                'author': comment['author__username'],
+                'text': comment['text'],
+                'created': comment['created'],
+            }
+            for comment in comments
+        ],
+        # Продолжение — posts:post_comments с ?format=json&after=.
+        'comments_next': comments.next_cursor,
+    })
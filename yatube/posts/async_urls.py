@@ -0,0 +1,22 @@
+from django.urls import path
+
+from . import async_views, urls
+
+app_name = 'posts'
+
+# Маршруты posts, в которых ленты заменены асинхронными версиями.
+ASYNC_VIEWS = {
+    'index': async_views.index,
+    'group_list': async_views.group_posts,
+    'profile': async_views.profile,
+    'post_detail': async_views.post_detail,
+    'follow_index': async_views.follow_index,
+}
+
+urlpatterns = [
+    path(
+        str(pattern.pattern),
+        ASYNC_VIEWS.get(pattern.name, pattern.callback),
+        name=pattern.name)
+    for pattern in urls.urlpatterns
+]
@@ -0,0 +1,132 @@
+"""Асинхронные версии лент для ASGI (yatube/asgi.py).
+
+Ответы те же, что у posts.views, но работа с базой, кешем и шаблонами
+выполняется в ограниченном пуле core.executor, а независимые запросы
+страницы идут параллельно: воркер не простаивает, пока ждёт базу.
+"""
+import asyncio
+import functools
+
+from core import executor
+from core.query_budget import query_budget
+from django.contrib.auth import get_user_model
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import get_object_or_404, render
+
+from . import cards, stats, versions, views
+from .models import Group, Post
+from .timeline import TimelinePaginator
+
+User = get_user_model()
+
+
+def _is_authenticated(request):
+    return request.user.is_authenticated
+
+
+def login_required(view):
+    """login_required для асинхронных view: пользователь из сессии
+    читается в пуле core.executor."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if await executor.run(_is_authenticated, request):
+            return await view(request, *args, **kwargs)
+        return redirect_to_login(request.get_full_path())
+    return wrapper
+
+
+@query_budget(6)
+@versions.conditional_page(views.feed_scopes)
+async def index(request):
+    post_list = cards.for_cards(Post.objects.all())
+    page_obj = await executor.run(views.include_paginator, request, post_list)
+    context = {
+        'page_obj': page_obj,
+    }
+    template = 'posts/index.html'
+    return await executor.run(render, request, template, context)
+
+
+@query_budget(8)
+@versions.conditional_page(views.group_scopes)
+async def group_posts(request, slug):
+    # Страница постов выбирается по slug, не дожидаясь самой группы.
+    post_list = cards.for_cards(Post.objects.filter(group__slug=slug))
+    group, page_obj = await asyncio.gather(
+        executor.run(get_object_or_404, Group, slug=slug),
+        executor.run(views.include_paginator, request, post_list),
+    )
+    context = {
+        'group': group,
+        'page_obj': page_obj,
+    }
+    template = 'posts/group_list.html'
+    return await executor.run(render, request, template, context)
+
+
+def _author(username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    return author, stats.for_user(author)
+
+
+@query_budget(9)
+@versions.conditional_page(views.profile_scopes)
+async def profile(request, username):
+    post_list = cards.for_cards(
+        Post.objects.filter(author__username=username))
+    (author, author_stats), page_obj = await asyncio.gather(
+        executor.run(_author, username),
+        executor.run(views.include_paginator, request, post_list),
+    )
+    context = {
+        'author_username': author,
+        'count_posts': author_stats.posts_count,
+        'author_stats': author_stats,
+        'page_obj': page_obj,
+    }
+    template = 'posts/profile.html'
+    return await executor.run(render, request, template, context)
+
+
+def _post(post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id)
+    return post, stats.for_user(post.author).posts_count
+
+
+def _comments(post_id):
+    return views.comments_paginator(post_id).get_page()
+
+
+@query_budget(7)
+@versions.conditional_page(views.post_scopes)
+async def post_detail(request, post_id):
+    (post, count_posts), comments = await asyncio.gather(
+        executor.run(_post, post_id),
+        executor.run(_comments, post_id),
+    )
+    context = {
+        'count_posts': count_posts,
+        'post': post,
+        'comments': comments,
+    }
+    template = 'posts/post_detail.html'
+    return await executor.run(render, request, template, context)
+
+
+@login_required
+@query_budget(7)
+async def follow_index(request):
+    # Пользователь уже прочитан в login_required, запросов здесь нет.
+    post_list = cards.for_cards(
+        Post.objects.filter(author__following__user=request.user))
+    page_obj = await executor.run(
+        views.include_paginator, request, post_list,
+        TimelinePaginator(request.user, views.POSTS_QUANTITY),
+    )
+    context = {
+        'page_obj': page_obj,
+    }
+    template = 'posts/follow.html'
+    return await executor.run(render, request, template, context)
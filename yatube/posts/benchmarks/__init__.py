@@ -0,0 +1,47 @@
+"""Микробенчмарки view-функций и тяжёлых шаблонов.
+
+Запуск: python manage.py runbenchmarks. Результаты сравниваются
+с baseline.json; обновить его — флаг --update-baseline.
+"""
+import os
+from io import StringIO
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import RequestFactory
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DATASET = {
+    'users': 200, 'posts': 3000, 'groups': 10, 'comments': 3.0,
+    'follows': 15.0, 'seed': 0, 'prefix': 'bench',
+}
+
+
+def setup():
+    """Генерирует фиксированный набор данных и выбирает в нём самые
+    нагруженные объекты."""
+    call_command('generate_dataset', stdout=StringIO(), **DATASET)
+    factory = RequestFactory()
+
+    def request(path, user=None, data=None):
+        request = factory.get(path, data)
+        request.user = user or AnonymousUser()
+        return request
+
+    return SimpleNamespace(
+        request=request,
+        author=User.objects.annotate(
+            total=Count('posts')).order_by('-total', 'pk').first(),
+        reader=User.objects.annotate(
+            total=Count('follower')).order_by('-total', 'pk').first(),
+        group=Group.objects.annotate(
+            total=Count('groups')).order_by('-total', 'pk').first(),
+        post=Post.objects.order_by('-comments_count', 'pk').first(),
+    )
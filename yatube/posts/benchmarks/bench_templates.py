@@ -0,0 +1,45 @@
+from core.benchmarks import benchmark
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+
+from posts import cards
+from posts.models import Post
+from posts.paginator import CursorPaginator
+from posts.views import POSTS_QUANTITY
+
+
+def page_of_posts():
+    return list(cards.for_cards(Post.objects.all())[:POSTS_QUANTITY])
+
+
+@benchmark('templates.content_loop')
+def content_loop(data):
+    """Карточки страницы, отрендеренные по одной без кеша."""
+    posts = page_of_posts()
+
+    def target():
+        for post in posts:
+            cards.render_card(post, 'feed')
+    return target
+
+
+@benchmark('templates.post_cards')
+def post_cards(data):
+    """Карточки страницы через render_cards с пустым кешем."""
+    posts = page_of_posts()
+    return lambda: cards.render_cards(posts, 'feed')
+
+
+@benchmark('templates.paginator_numbered')
+def paginator_numbered(data):
+    page_obj = Paginator(Post.objects.all(), POSTS_QUANTITY).get_page(50)
+    return lambda: render_to_string(
+        'posts/includes/paginator.html', {'page_obj': page_obj})
+
+
+@benchmark('templates.paginator_cursor')
+def paginator_cursor(data):
+    page_obj = CursorPaginator(
+        Post.objects.all(), POSTS_QUANTITY).get_page()
+    return lambda: render_to_string(
+        'posts/includes/paginator.html', {'page_obj': page_obj})
@@ -0,0 +1,59 @@
+from core.benchmarks import benchmark
+from django.urls import reverse
+
+from posts import views
+
+
+@benchmark('views.index')
+def index(data):
+    return lambda: views.index(data.request(reverse('posts:index')))
+
+
+@benchmark('views.index_legacy_page')
+def index_legacy_page(data):
+    def target():
+        return views.index(
+            data.request(reverse('posts:index'), data={'page': 50}))
+    return target
+
+
+@benchmark('views.group_posts')
+def group_posts(data):
+    slug = data.group.slug
+    return lambda: views.group_posts(
+        data.request(reverse('posts:group_list', args=[slug])), slug)
+
+
+@benchmark('views.profile')
+def profile(data):
+    username = data.author.username
+    return lambda: views.profile(
+        data.request(reverse('posts:profile', args=[username])), username)
+
+
+@benchmark('views.post_detail')
+def post_detail(data):
+    post_id = data.post.pk
+    return lambda: views.post_detail(
+        data.request(reverse('posts:post_detail', args=[post_id])), post_id)
+
+
+@benchmark('views.post_comments')
+def post_comments(data):
+    post_id = data.post.pk
+    return lambda: views.post_comments(
+        data.request(reverse('posts:post_comments', args=[post_id])),
+        post_id)
+
+
+@benchmark('views.follow_index')
+def follow_index(data):
+    return lambda: views.follow_index(
+        data.request(reverse('posts:follow_index'), user=data.reader))
+
+
+@benchmark('views.search')
+def search_posts(data):
+    query = data.post.text.split()[0]
+    return lambda: views.search_posts(
+        data.request(reverse('posts:search'), data={'q': query}))
@@ -0,0 +1,39 @@
+from contextlib import contextmanager
+from itertools import islice
+
+from django.db import connection
+
+# Сколько значений передавать в один IN, если база не ограничивает
+# число параметров; заодно запас под остальные параметры запроса.
+MAX_IN_SIZE = 900
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now и auto_now_add, чтобы bulk_create записал
+    заданные даты, а не текущее время."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def chunks(iterable, size):
+    iterable = iter(iterable)
+    while True:
+        chunk = list(islice(iterable, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def in_chunks(values, lists=1):
+    """Режет значения для IN на пачки, чтобы запрос с lists такими
+    списками уложился в предел параметров базы."""
+    limit = min(
+        connection.features.max_query_params or MAX_IN_SIZE, MAX_IN_SIZE)
+    return chunks(values, max(limit // lists, 1))
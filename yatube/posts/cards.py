@@ -0,0 +1,86 @@
+from core import stampede
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from . import thumbnails
+from .models import Post
+
+CARD_TEMPLATE = 'posts/includes/content.html'
+CARD_TIMEOUT = 60 * 60 * 24
+CARD_SEPARATOR = '<hr>'
+
+# Колонки, которые читает шаблон карточки.
+CARD_FIELDS = (
+    'id', 'text', 'created', 'updated', 'image',
+    'author__username', 'author__first_name', 'author__last_name',
+    'group__slug',
+)
+
+VARIANTS = {
+    'feed': {'show_author': True, 'show_group': True},
+    'group': {'show_author': True, 'show_group': False},
+    'profile': {'show_author': False, 'show_group': True},
+}
+
+
+def card_key(post, variant):
+    """Ключ карточки меняется вместе с post.updated, поэтому правка поста
+    не требует явного сброса: следующий рендер читает новый ключ."""
+    version = post.updated.timestamp() if post.updated else 0
+    return f'post_card:{variant}:{post.id}:{version:.6f}'
+
+
+def for_cards(queryset, prefix='', fields=()):
+    """Загружает вместе с постами автора и группу, только нужные
+    карточке колонки.
+
+    prefix — путь к посту от модели queryset, fields — дополнительные
+    колонки этой модели.
+    """
+    return queryset.select_related(
+        f'{prefix}author', f'{prefix}group'
+    ).only(*fields, *(f'{prefix}{field}' for field in CARD_FIELDS))
+
+
+def card_keys(post):
+    return [card_key(post, variant) for variant in VARIANTS]
+
+
+def render_card(post, variant, previews=None):
+    context = {'post': post, 'thumbnails': previews, **VARIANTS[variant]}
+    return render_to_string(CARD_TEMPLATE, context)
+
+
+def render_cards(posts, variant='feed'):
+    """Карточки постов страницы: все кешированные фрагменты читаются
+    одним get_many, отсутствующие рендерит один воркер (core.stampede)
+    одним проходом с общими чтениями превью и вариантов картинок."""
+    by_key = {card_key(post, variant): post for post in posts}
+
+    def render_missing(keys):
+        missing = [by_key[key] for key in keys]
+        with_images = [post for post in missing if post.image]
+        prefetch_related_objects(with_images, 'image_variants')
+        previews = thumbnails.lookup_many(
+            post.image for post in with_images)
+        return {
+            key: render_card(post, variant, previews)
+            for key, post in zip(keys, missing)
+        }
+
+    cards = stampede.get_many_or_set(
+        list(by_key), render_missing, CARD_TIMEOUT)
+    return mark_safe(CARD_SEPARATOR.join(cards[key] for key in by_key))
+
+
+def invalidate(post):
+    cache.delete_many(card_keys(post))
+
+
+def touch_posts(**filters):
+    """Сдвигает updated у постов, чья карточка зависит от изменённых
+    автора или группы, чтобы их карточки отрендерились заново."""
+    Post.objects.filter(**filters).update(updated=timezone.now())
@@ -0,0 +1,91 @@
+import csv
+
+from .bulk import chunks
+from .ndjson import dumps
+
+CHUNK_SIZE = 2000
+# Сколько строк склеивать в один кусок ответа: по строке на кусок
+# сервер делал бы отдельную запись в сокет.
+LINES_PER_CHUNK = 200
+
+# Тип записи: (связь автора, колонки). Посты выгружаются раньше
+# комментариев, внутри типа — по возрастанию id.
+KINDS = {
+    'post': ('posts', (
+        'id', 'created', 'updated', 'group__slug', 'text', 'image',
+        'comments_count',
+    )),
+    'comment': ('comments', ('id', 'created', 'post_id', 'text')),
+}
+RENAMED = {'group__slug': 'group', 'post_id': 'post'}
+COLUMNS = (
+    'cursor', 'type', 'id', 'created', 'updated', 'group', 'post', 'text',
+    'image', 'comments_count',
+)
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(kind, pk):
+    return f'{kind}:{pk}'
+
+
+def decode_cursor(token):
+    """Тип и id записи, после которой продолжить выгрузку."""
+    kind, _, pk = token.partition(':')
+    if kind not in KINDS or not pk.isdigit():
+        raise InvalidCursor(token)
+    return kind, int(pk)
+
+
+def records(author, after=None):
+    """Посты и комментарии автора словарями, начиная после курсора.
+
+    Строки читаются iterator() пачками по CHUNK_SIZE, без кеша
+    QuerySet, поэтому память не зависит от числа записей.
+    """
+    kinds = list(KINDS)
+    last_pk = 0
+    if after is not None:
+        kind, last_pk = after
+        kinds = kinds[kinds.index(kind):]
+    for kind in kinds:
+        relation, fields = KINDS[kind]
+        rows = getattr(author, relation).filter(
+            pk__gt=last_pk).order_by('pk').values_list(*fields)
+        names = [RENAMED.get(field, field) for field in fields]
+        for row in rows.iterator(chunk_size=CHUNK_SIZE):
+            record = dict(zip(names, row))
+            yield {
+                'cursor': encode_cursor(kind, record['id']),
+                'type': kind,
+                **record,
+            }
+        last_pk = 0
+
+
+def ndjson_lines(records):
+    for chunk in chunks(records, LINES_PER_CHUNK):
+        yield ''.join(f'{dumps(record)}\n' for record in chunk)
+
+
+class Echo:
+    """Буфер для csv.writer, который сразу возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    writer = csv.DictWriter(Echo(), COLUMNS, restval='')
+    yield writer.writeheader()
+    for chunk in chunks(records, LINES_PER_CHUNK):
+        yield ''.join(writer.writerow(record) for record in chunk)
+
+
+FORMATS = {
+    'ndjson': (ndjson_lines, 'application/x-ndjson; charset=utf-8'),
+    'csv': (csv_lines, 'text/csv; charset=utf-8'),
+}
@@ -0,0 +1,34 @@
+from core import holes
+from django.template.loader import render_to_string
+
+from .forms import CommentForm
+from .models import Follow
+
+
+@holes.register('switcher')
+def switcher(request):
+    return render_to_string('posts/includes/switcher.html', request=request)
+
+
+@holes.register('follow_button')
+def follow_button(request, username):
+    user = request.user
+    following = user.is_authenticated and Follow.objects.filter(
+        user=user, author__username=username).exists()
+    context = {'username': username, 'following': following}
+    return render_to_string(
+        'posts/includes/follow_button.html', context, request)
+
+
+@holes.register('post_edit')
+def post_edit(request, post_id, author):
+    context = {'post_id': post_id, 'author': author}
+    return render_to_string(
+        'posts/includes/post_edit_button.html', context, request)
+
+
+@holes.register('comment_form')
+def comment_form(request, post_id):
+    context = {'post_id': post_id, 'form': CommentForm()}
+    return render_to_string(
+        'posts/includes/comment_form.html', context, request)
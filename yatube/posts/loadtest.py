@@ -0,0 +1,178 @@
+import random
+
+from core.loadtest import ANONYMOUS, USER, WRITE, Route, Session
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from .models import Follow, Group, Post
+
+User = get_user_model()
+
+# Сколько постов, авторов и групп брать в пулы для адресов запросов.
+POOL_SIZE = 1000
+LOGIN_USERNAME = 'loadtest'
+LOGIN_PASSWORD = 'loadtest-password'
+
+
+class Pools:
+    """Существующие объекты, из которых собираются адреса запросов."""
+
+    def __init__(self):
+        posts = list(Post.objects.order_by('-created').values_list(
+            'pk', 'text')[:POOL_SIZE])
+        self.post_ids = [pk for pk, _ in posts]
+        self.words = [
+            word for _, text in posts for word in text.split()[:3]
+            if word.isalpha()
+        ] or ['пост']
+        self.usernames = list(User.objects.filter(
+            posts__isnull=False).order_by().values_list(
+            'username', flat=True).distinct()[:POOL_SIZE])
+        self.slugs = list(
+            Group.objects.values_list('slug', flat=True)[:POOL_SIZE])
+
+
+def login_user():
+    """Пользователь с известным паролем для запросов на вход."""
+    user, created = User.objects.get_or_create(username=LOGIN_USERNAME)
+    if created:
+        user.set_password(LOGIN_PASSWORD)
+        user.save(update_fields=['password'])
+    return user
+
+
+def sessions(count, auth_ratio, seed=0):
+    """Посетители: доля auth_ratio вошла под существующими
+    пользователями, остальные анонимны."""
+    rng = random.Random(seed)
+    user_ids = list(User.objects.filter(is_active=True).exclude(
+        username=LOGIN_USERNAME).order_by('pk').values_list(
+        'pk', flat=True)[:POOL_SIZE * 10])
+    authenticated = min(round(count * auth_ratio), len(user_ids))
+    users = User.objects.in_bulk(rng.sample(user_ids, authenticated))
+    result = []
+    for user in users.values():
+        client = Client()
+        client.force_login(user)
+        result.append(Session(
+            user=user,
+            cookies={settings.SESSION_COOKIE_NAME: client.cookies[
+                settings.SESSION_COOKIE_NAME].value},
+            own_posts=list(Post.objects.filter(author=user).values_list(
+                'pk', flat=True)[:POOL_SIZE]),
+            following=list(Follow.objects.filter(user=user).values_list(
+                'author__username', flat=True)[:POOL_SIZE]),
+        ))
+    result += [Session() for _ in range(count - len(result))]
+    for session in result:
+        # CSRF-токен в cookie и в форме совпадают, как после GET формы.
+        session.csrf = get_random_string(64)
+        session.cookies[settings.CSRF_COOKIE_NAME] = session.csrf
+    return result
+
+
+def choice(values):
+    def build(rng, session):
+        return rng.choice(values) if values else None
+    return build
+
+
+def own_post(rng, session):
+    return rng.choice(session.own_posts) if session.own_posts else None
+
+
+def followed(rng, session):
+    return rng.choice(session.following) if session.following else None
+
+
+def _args(arg, rng, session):
+    """Аргументы адреса или None, если их не из чего взять."""
+    if arg is None:
+        return []
+    value = arg(rng, session)
+    return None if value is None else [value]
+
+
+def get(name, arg=None):
+    def build(rng, session):
+        args = _args(arg, rng, session)
+        if args is None:
+            return None
+        return 'GET', reverse(name, args=args), None
+    return build
+
+
+def post(name, data, arg=None):
+    def build(rng, session):
+        args = _args(arg, rng, session)
+        if args is None:
+            return None
+        form = dict(data(rng, session))
+        form['csrfmiddlewaretoken'] = session.csrf
+        return 'POST', reverse(name, args=args), form
+    return build
+
+
+def signup_form(rng, session):
+    password = get_random_string(16)
+    return {
+        'username': f'loadtest-{get_random_string(12)}',
+        'password1': password,
+        'password2': password,
+    }
+
+
+def credentials(rng, session):
+    return {'username': LOGIN_USERNAME, 'password': LOGIN_PASSWORD}
+
+
+def routes(pools):
+    """Маршруты posts и авторизации с весами в смеси чтения и записи."""
+    post_id = choice(pools.post_ids)
+    username = choice(pools.usernames)
+    slug = choice(pools.slugs)
+
+    def text(rng, session):
+        return {'text': ' '.join(rng.choices(pools.words, k=12))}
+
+    def search(rng, session):
+        return 'GET', reverse('posts:search'), {
+            'q': rng.choice(pools.words)}
+
+    return [
+        Route('posts:index', get('posts:index'), weight=30),
+        Route('posts:group_list', get('posts:group_list', slug), weight=10),
+        Route('posts:profile', get('posts:profile', username), weight=15),
+        Route('posts:post_detail', get('posts:post_detail', post_id),
+              weight=20),
+        Route('posts:post_comments', get('posts:post_comments', post_id),
+              weight=5),
+        Route('posts:search', search, weight=5),
+        Route('posts:follow_index', get('posts:follow_index'), weight=10,
+              audience=USER),
+        Route('posts:post_create', get('posts:post_create'), audience=USER),
+        Route('posts:post_edit', get('posts:post_edit', own_post),
+              audience=USER),
+        Route('users:login', get('users:login'), weight=2,
+              audience=ANONYMOUS),
+        Route('users:signup', get('users:signup'), audience=ANONYMOUS),
+        Route('users:logout', get('users:logout'), audience=ANONYMOUS),
+        Route('posts:post_create:post', post('posts:post_create', text),
+              weight=3, kind=WRITE, audience=USER),
+        Route('posts:post_edit:post', post('posts:post_edit', text, own_post),
+              kind=WRITE, audience=USER),
+        Route('posts:add_comment', post('posts:add_comment', text, post_id),
+              weight=5, kind=WRITE, audience=USER),
+        Route('posts:profile_follow', get('posts:profile_follow', username),
+              weight=3, kind=WRITE, audience=USER),
+        Route('posts:profile_unfollow',
+              get('posts:profile_unfollow', followed),
+              weight=2, kind=WRITE, audience=USER),
+        Route('users:login:post', post('users:login', credentials),
+              kind=WRITE, audience=ANONYMOUS),
+        Route('users:signup:post', post('users:signup', signup_form),
+              kind=WRITE, audience=ANONYMOUS),
+    ]
@@ -0,0 +1,91 @@
+from core import loadtest
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import loadtest as scenario
+from posts.async_urls import ASYNC_VIEWS
+from yatube.asgi import application as asgi_application
+from yatube.wsgi import application as wsgi_application
+
+# Приложения вызываются напрямую, без сокетов: сравнивается только
+# модель обработки запросов.
+TRANSPORTS = {
+    'wsgi': lambda: loadtest.WSGITransport(wsgi_application),
+    'asgi': lambda: loadtest.ASGITransport(asgi_application),
+}
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность WSGI- и ASGI-приложения '
+            'на лентах при разной конкурентности на одних и тех же данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 4, 16, 64],
+            help='Уровни конкурентности: число одновременных клиентов.')
+        parser.add_argument(
+            '--duration', type=float, default=10.0,
+            help='Секунд на каждый прогон.')
+        parser.add_argument(
+            '--requests', type=int,
+            help='Остановить прогон после стольких запросов.')
+        parser.add_argument(
+            '--warmup', type=float, default=2.0,
+            help='Секунд прогрева кешей каждого приложения перед замером.')
+        parser.add_argument('--sessions', type=int, default=50)
+        parser.add_argument('--auth-ratio', type=float, default=0.5)
+        parser.add_argument(
+            '--routes', nargs='+', metavar='ROUTE',
+            help='Маршруты; по умолчанию ленты с асинхронными версиями.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Сохранить результат в JSON.')
+
+    def handle(self, *args, **options):
+        if settings.DEBUG:
+            self.stderr.write(
+                'DEBUG включён: задержки не отражают работу в бою.')
+        names = options['routes'] or [
+            f'posts:{name}' for name in ASYNC_VIEWS]
+        routes = [
+            route for route in scenario.routes(scenario.Pools())
+            if route.name in names and route.kind == loadtest.READ
+        ]
+        if not routes:
+            raise CommandError('Ни один маршрут не подошёл.')
+        sessions = scenario.sessions(
+            options['sessions'], options['auth_ratio'], options['seed'])
+        results = {}
+        for app, make_transport in TRANSPORTS.items():
+            client = make_transport()
+            try:
+                if options['warmup'] > 0:
+                    self.run(client, routes, sessions, 1,
+                             duration=options['warmup'], seed=options['seed'])
+                results[app] = {
+                    level: self.run(
+                        client, routes, sessions, level,
+                        duration=options['duration'],
+                        requests=options['requests'], seed=options['seed'])
+                    for level in options['concurrency']
+                }
+            finally:
+                if hasattr(client, 'close'):
+                    client.close()
+        self.stdout.write(loadtest.concurrency_report(results))
+        if options['output']:
+            loadtest.save({
+                'config': {
+                    key: options[key] for key in (
+                        'concurrency', 'duration', 'requests', 'sessions',
+                        'auth_ratio', 'routes', 'seed',
+                    )
+                },
+                'results': results,
+            }, options['output'])
+
+    def run(self, client, routes, sessions, concurrency, duration,
+            requests=None, seed=0):
+        return loadtest.LoadTest(
+            client, routes, sessions, concurrency=concurrency,
+            duration=duration, requests=requests, write_ratio=0.0, seed=seed,
+        ).run()
@@ -0,0 +1,39 @@
+from django.db import connections
+
+from posts import thumbnails, variants
+from posts.models import Post
+
+from .warm_thumbnails import Command as WarmThumbnailsCommand
+
+
+def build_chunk(post_images, force=False):
+    """Строит WebP-варианты в дочернем процессе.
+
+    Возвращает посты, для которых появились новые файлы.
+    """
+    built = []
+    for post_id, image in post_images:
+        try:
+            if variants.build(post_id, image, force=force):
+                built.append((post_id, image))
+        except Exception:
+            thumbnails.logger.exception(
+                'Не удалось построить варианты %s', image)
+    connections.close_all()
+    return built
+
+
+def force_build_chunk(post_images):
+    return build_chunk(post_images, force=True)
+
+
+class Command(WarmThumbnailsCommand):
+    help = ('Строит WebP-варианты картинок существующих постов, '
+            'пропуская уже актуальные.')
+
+    def get_posts(self, force):
+        self.worker = force_build_chunk if force else build_chunk
+        return Post.objects.exclude(image='').order_by('pk')
+
+    def finish(self, done):
+        thumbnails.images_changed([post_id for post_id, _ in done])
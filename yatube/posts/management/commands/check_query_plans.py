@@ -0,0 +1,170 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from posts import export, search
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Выбор группы в форме поста читает весь справочник групп.
+ALLOWED_SCANS = {'posts_group'}
+# Ранжирование результатов поиска сортирует только найденные строки.
+ALLOWED_SORTS = {search.TABLE}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Проверяет EXPLAIN QUERY PLAN запросов view-функций posts: '
+            'без полного сканирования таблиц и сортировки во временном '
+            'B-дереве.')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда рассчитана на SQLite.')
+        # Страницы из кеша не выполняют запросов, которые надо проверить.
+        middleware = [
+            name for name in settings.MIDDLEWARE
+            if name != 'posts.middleware.PageCacheMiddleware'
+        ]
+        try:
+            with transaction.atomic(), override_settings(
+                MIDDLEWARE=middleware
+            ):
+                problems = self.check_views()
+                raise Rollback
+        except Rollback:
+            pass
+        if problems:
+            raise CommandError(
+                'Запросы без индекса:\n' + '\n'.join(problems))
+        self.stdout.write(
+            self.style.SUCCESS('Все запросы используют индексы.'))
+
+    def create_data(self):
+        author = User.objects.create_user(username='plan-author')
+        reader = User.objects.create_user(username='plan-reader')
+        celebrity = User.objects.create_user(username='plan-celebrity')
+        group = Group.objects.create(
+            title='Plan group', slug='plan-group', description='Plan')
+        posts = [
+            Post.objects.create(author=user, group=group, text='Plan text')
+            for user in (author, celebrity) for _ in range(12)
+        ]
+        Comment.objects.create(post=posts[0], author=reader, text='Plan')
+        Follow.objects.create(user=reader, author=author)
+        with override_settings(TIMELINE_FANOUT_LIMIT=0):
+            Follow.objects.create(user=reader, author=celebrity)
+        return author, reader, group, posts[0]
+
+    def requests(self, author, reader, group, post):
+        """Запросы ко всем view-функциям posts: (пользователь, метод,
+        адрес, данные)."""
+        # В ленте подписок читателя есть и разложенный автор, и автор
+        # без раскладки (см. create_data): проверяются обе её части.
+        feed_pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[group.slug]),
+            reverse('posts:profile', args=[author.username]),
+            reverse('posts:follow_index'),
+        ]
+        api_pages = [
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=[group.slug]),
+            reverse('posts:api_profile', args=[author.username]),
+            reverse('posts:api_follow_index'),
+        ]
+        client = Client()
+        client.force_login(reader)
+        for url in feed_pages + api_pages:
+            response = client.get(url)
+            if url in api_pages:
+                cursor = response.json()['next']
+            else:
+                cursor = response.context['page_obj'].next_cursor
+            yield reader, 'get', url, {}
+            yield reader, 'get', url, {'after': cursor}
+            yield reader, 'get', url, {'before': cursor}
+        yield None, 'get', reverse('posts:api_post_detail', args=[post.id]), {}
+        export_url = reverse('posts:profile_export', args=[author.username])
+        for export_format in export.FORMATS:
+            yield author, 'get', export_url, {'format': export_format}
+        yield author, 'get', export_url, {
+            'after': export.encode_cursor('post', post.id)}
+        yield None, 'get', reverse('posts:index'), {}
+        yield reader, 'get', reverse('posts:post_detail', args=[post.id]), {}
+        comments_url = reverse('posts:post_comments', args=[post.id])
+        cursor = client.get(
+            reverse('posts:post_detail', args=[post.id])
+        ).context['comments'].paginator.encode_cursor(post.comments.first())
+        yield None, 'get', comments_url, {'after': cursor}
+        yield None, 'get', comments_url, {'after': cursor, 'format': 'json'}
+        yield None, 'get', reverse('posts:search'), {'q': 'plan'}
+        cursor = client.get(reverse('posts:search'), {'q': 'plan'}).context[
+            'page_obj'].next_cursor
+        yield None, 'get', reverse('posts:search'), {
+            'q': 'plan', 'after': cursor}
+        yield None, 'get', reverse('posts:search'), {
+            'q': 'plan', 'before': cursor}
+        yield author, 'get', reverse('posts:post_create'), {}
+        yield author, 'get', reverse('posts:post_edit', args=[post.id]), {}
+        yield reader, 'post', reverse('posts:add_comment', args=[post.id]), {
+            'text': 'Plan comment'}
+        yield reader, 'get', reverse('posts:profile_unfollow', args=[
+            author.username]), {}
+        yield reader, 'get', reverse('posts:profile_follow', args=[
+            author.username]), {}
+
+    def check_views(self):
+        author, reader, group, post = self.create_data()
+        clients = {None: Client()}
+        for user in (author, reader):
+            clients[user] = Client()
+            clients[user].force_login(user)
+        problems = []
+        for user, method, url, data in self.requests(
+            author, reader, group, post
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(clients[user], method)(url, data)
+                if response.streaming:
+                    # Выгрузка читает базу, пока отдаёт тело ответа.
+                    b''.join(response.streaming_content)
+            for query in queries.captured_queries:
+                sql = query['sql']
+                problems.extend(
+                    f'{method.upper()} {url} {data}: {detail}\n    {sql}'
+                    for detail in self.plan_problems(sql)
+                )
+        return problems
+
+    def plan_problems(self, sql):
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            details = [row[-1] for row in cursor.fetchall()]
+        if self.verbosity > 1:
+            self.stdout.write(sql)
+        problems = []
+        for detail in details:
+            if self.verbosity > 1:
+                self.stdout.write(f'    {detail}')
+            words = detail.split()
+            if 'TEMP B-TREE' in detail:
+                if not any(table in sql for table in ALLOWED_SORTS):
+                    problems.append(detail)
+            elif (words[0] == 'SCAN' and 'USING' not in words
+                  and 'VIRTUAL' not in words):
+                table = words[2] if words[1] == 'TABLE' else words[1]
+                if table not in ALLOWED_SCANS:
+                    problems.append(detail)
+        return problems
@@ -0,0 +1,56 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import ndjson
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, пользователей, посты, комментарии и подписки '
+            'в NDJSON потоково, пачками по pk.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON.')
+        parser.add_argument(
+            '--types', nargs='+', choices=ndjson.TYPES, default=ndjson.TYPES,
+            help='Какие типы записей выгружать.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=ndjson.CHUNK_SIZE)
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить прерванную выгрузку с контрольной точки.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        checkpoint = f'{path}.checkpoint'
+        types = [kind for kind in ndjson.TYPES if kind in options['types']]
+        state = None
+        if options['resume']:
+            state = ndjson.read_checkpoint(checkpoint)
+            if state is None or state['type'] not in types:
+                raise CommandError(f'Нет контрольной точки {checkpoint}.')
+            types = types[types.index(state['type']):]
+        total = 0
+        with open(path, 'a' if state else 'w', encoding='utf-8') as file:
+            if state:
+                # Строки, записанные после последней контрольной точки,
+                # выгружаются заново.
+                file.truncate(state['offset'])
+            for kind in types:
+                last_pk = state['last_pk'] if state and (
+                    state['type'] == kind) else 0
+                for last_pk, lines in ndjson.export_chunks(
+                    kind, last_pk, options['chunk_size']
+                ):
+                    file.write('\n'.join(lines) + '\n')
+                    file.flush()
+                    total += len(lines)
+                    ndjson.write_checkpoint(checkpoint, {
+                        'type': kind, 'last_pk': last_pk,
+                        'offset': file.tell(),
+                    })
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'{kind}: до pk {last_pk}')
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(f'Выгружено записей: {total}'))
@@ -0,0 +1,316 @@
+import random
+from datetime import date, datetime, time, timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+
+from posts import stats, versions
+from posts.bulk import chunks, explicit_dates
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+WORDS = (
+    'день', 'город', 'кот', 'собака', 'книга', 'дорога', 'море', 'лес',
+    'утро', 'вечер', 'работа', 'друг', 'дом', 'окно', 'снег', 'дождь',
+    'солнце', 'музыка', 'фильм', 'кофе', 'поезд', 'река', 'гора', 'сад',
+    'новый', 'старый', 'тихий', 'быстрый', 'длинный', 'тёплый', 'первый',
+    'смотрел', 'читал', 'писал', 'думал', 'ехал', 'ждал', 'слушал',
+    'сегодня', 'вчера', 'снова', 'опять', 'очень', 'почти', 'всегда',
+    'и', 'в', 'на', 'про', 'под', 'после', 'без', 'через',
+)
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Лев', 'Вера',
+               'Олег', 'Нина', 'Глеб')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов',
+              'Лебедев', 'Козлов', 'Новиков', 'Морозов', 'Волков')
+IMAGES_DIR = 'posts/synthetic'
+IMAGE_SIZE = (1200, 800)
+SAMPLE_IMAGES = 16
+# Параметр распределения Парето для числа комментариев и подписок:
+# среднее (alpha / (alpha - 1)) - 1 = 2.
+PARETO_ALPHA = 1.5
+# Конец интервала дат по умолчанию.
+UNTIL = '2024-01-01'
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, постами, '
+            'комментариями и подписками для нагрузочных тестов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument(
+            '--comments', type=float, default=2.0,
+            help='Среднее число комментариев к посту.',
+        )
+        parser.add_argument(
+            '--follows', type=float, default=10.0,
+            help='Среднее число подписок пользователя.',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой, от 0 до 1.',
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель закона Ципфа для активности авторов.',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней распределить посты.',
+        )
+        parser.add_argument(
+            '--until', type=date.fromisoformat, default=UNTIL,
+            help='Дата (ГГГГ-ММ-ДД), до которой распределить посты.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='synthetic',
+            help='Префикс имён пользователей и slug групп.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Сколько строк вставлять за одну транзакцию.',
+        )
+        parser.add_argument(
+            '--no-timelines', action='store_true',
+            help='Не раскладывать посты в материализованные ленты.',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 2:
+            raise CommandError('Нужно хотя бы два пользователя.')
+        if not 0 <= options['images'] <= 1:
+            raise CommandError('--images задаёт долю от 0 до 1.')
+        self.prefix = options['prefix']
+        self.verbosity = options['verbosity']
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {self.prefix!r} уже есть; '
+                f'задайте другой --prefix.')
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        # Даты отсчитываются от --until, а не от текущего времени:
+        # один seed в любой день даёт одинаковые данные.
+        self.until = timezone.make_aware(
+            datetime.combine(options['until'], time.min))
+        self.since = self.until - timedelta(days=options['days'])
+
+        users = self.create_users(options['users'])
+        groups = self.create_groups(options['groups'])
+        images = self.create_images(options['images'])
+        # Активность в постах и популярность в подписках не связаны:
+        # у каждого распределения свой порядок пользователей.
+        posting = self.zipf_weights(users, options['zipf'])
+        popular = self.zipf_weights(users, options['zipf'])
+        self.create_posts(
+            options['posts'], posting, groups, images, options['comments'],
+            users)
+        self.create_follows(users, popular, options['follows'])
+        if not options['no_timelines']:
+            self.fill_timelines()
+        stats.rebuild()
+        versions.bump(versions.SITE)
+        self.stdout.write(self.style.SUCCESS('Данные сгенерированы.'))
+        if images:
+            self.stdout.write(
+                'Превью картинок строит команда warm_thumbnails.')
+
+    def report(self, message):
+        if self.verbosity > 1:
+            self.stdout.write(message)
+
+    def text(self, low, high):
+        return ' '.join(
+            self.rng.choices(WORDS, k=self.rng.randint(low, high))
+        ).capitalize()
+
+    def pareto(self, mean):
+        """Целое с тяжёлым хвостом и заданным средним."""
+        return round((self.rng.paretovariate(PARETO_ALPHA) - 1) * mean / 2)
+
+    def zipf_weights(self, population, exponent):
+        ranked = list(population)
+        self.rng.shuffle(ranked)
+        weights = accumulate(
+            1 / rank ** exponent for rank in range(1, len(ranked) + 1))
+        return ranked, list(weights)
+
+    def sample(self, weighted, count):
+        population, cum_weights = weighted
+        return self.rng.choices(population, cum_weights=cum_weights, k=count)
+
+    def insert(self, model, objects):
+        """Вставляет объекты пачками, каждую в своей транзакции."""
+        total = 0
+        for chunk in chunks(objects, self.chunk_size):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk)
+            total += len(chunk)
+            self.report(f'{model._meta.verbose_name_plural}: {total}')
+        return total
+
+    def new_pks(self, model, last_pk):
+        return list(
+            model.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', flat=True))
+
+    def last_pk(self, model):
+        last = model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first()
+        return last or 0
+
+    def create_users(self, count):
+        last_pk = self.last_pk(User)
+        self.insert(User, (
+            User(
+                username=f'{self.prefix}{number}',
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                # Непригодный пароль: хешировать миллионы паролей долго.
+                password='!',
+            )
+            for number in range(count)
+        ))
+        return self.new_pks(User, last_pk)
+
+    def create_groups(self, count):
+        last_pk = self.last_pk(Group)
+        self.insert(Group, (
+            Group(
+                title=self.text(1, 3),
+                slug=f'{self.prefix}-{number}'[:20],
+                description=self.text(5, 20),
+            )
+            for number in range(count)
+        ))
+        return self.new_pks(Group, last_pk)
+
+    def create_images(self, share):
+        """Несколько картинок, общих для всех постов с картинкой."""
+        if not share:
+            return []
+        names = []
+        for number in range(SAMPLE_IMAGES):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            buffer = BytesIO()
+            Image.new('RGB', IMAGE_SIZE, color).save(buffer, 'JPEG')
+            name = f'{IMAGES_DIR}/{self.prefix}-{number}.jpg'
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            names.append(default_storage.save(
+                name, ContentFile(buffer.getvalue())))
+        self.image_share = share
+        return names
+
+    def random_date(self, since):
+        span = (self.until - since).total_seconds()
+        return since + timedelta(seconds=self.rng.uniform(0, span))
+
+    def post_objects(self, count, posting, groups, images):
+        authors = self.sample(posting, count)
+        group_weights = self.zipf_weights(groups, 1.0) if groups else None
+        for author_id in authors:
+            has_image = images and self.rng.random() < self.image_share
+            created = self.random_date(self.since)
+            yield Post(
+                author_id=author_id,
+                group_id=(
+                    self.sample(group_weights, 1)[0]
+                    if groups and self.rng.random() < 0.6 else None),
+                text=self.text(5, 60),
+                image=self.rng.choice(images) if has_image else '',
+                created=created,
+                updated=created,
+            )
+
+    def create_posts(self, count, posting, groups, images, comments, users):
+        """Посты и комментарии к ним; число комментариев поста задаётся
+        заранее, поэтому comments_count не пересчитывается."""
+        posts = self.post_objects(count, posting, groups, images)
+        total = 0
+        created_fields = (
+            Post._meta.get_field('created'), Post._meta.get_field('updated'),
+            Comment._meta.get_field('created'),
+        )
+        with explicit_dates(*created_fields):
+            for chunk in chunks(posts, self.chunk_size):
+                for post in chunk:
+                    post.comments_count = self.pareto(comments)
+                last_pk = self.last_pk(Post)
+                with transaction.atomic():
+                    Post.objects.bulk_create(chunk)
+                    pks = self.new_pks(Post, last_pk)
+                    Comment.objects.bulk_create(
+                        self.comment_objects(zip(pks, chunk), users),
+                        batch_size=self.chunk_size,
+                    )
+                total += len(chunk)
+                self.report(f'Постов: {total}')
+
+    def comment_objects(self, posts, users):
+        for pk, post in posts:
+            for _ in range(post.comments_count):
+                yield Comment(
+                    post_id=pk,
+                    author_id=self.rng.choice(users),
+                    text=self.text(2, 20),
+                    created=self.random_date(post.created),
+                )
+
+    def create_follows(self, users, popular, mean):
+        """Подписки со степенным распределением: число подписок
+        пользователя — Парето, авторы выбираются по Ципфу."""
+        fanout_limit = settings.TIMELINE_FANOUT_LIMIT
+        fanout_followers = {}
+
+        def follows():
+            for user_id in users:
+                wanted = min(self.pareto(mean), len(users) - 1)
+                authors = set()
+                # Популярные авторы выпадают часто; попыток с запасом.
+                for author_id in self.sample(popular, wanted * 3):
+                    if len(authors) == wanted:
+                        break
+                    if author_id != user_id:
+                        authors.add(author_id)
+                for author_id in sorted(authors):
+                    fanout = fanout_followers.get(author_id, 0) < fanout_limit
+                    if fanout:
+                        fanout_followers[author_id] = (
+                            fanout_followers.get(author_id, 0) + 1)
+                    yield Follow(
+                        user_id=user_id, author_id=author_id, fanout=fanout)
+
+        self.insert(Follow, follows())
+
+    def fill_timelines(self):
+        """Раскладывает посты авторов в ленты материализованных
+        подписчиков одним INSERT ... SELECT на пачку подписок."""
+        follows = list(Follow.objects.filter(
+            fanout=True, user__username__startswith=self.prefix,
+        ).order_by('pk').values_list('pk', flat=True))
+        sql = (
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            f'(user_id, post_id, author_id, created) '
+            f'SELECT f.user_id, p.id, p.author_id, p.created '
+            f'FROM {Follow._meta.db_table} f '
+            f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+            f'WHERE f.fanout AND f.id BETWEEN %s AND %s'
+        )
+        total = 0
+        for chunk in chunks(follows, self.chunk_size // 10 or 1):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, [chunk[0], chunk[-1]])
+                total += cursor.rowcount
+            self.report(f'Записей лент: {total}')
@@ -0,0 +1,50 @@
+import os
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import ndjson
+from posts.bulk import chunks
+
+
+class Command(BaseCommand):
+    help = ('Загружает NDJSON из export_ndjson пачками: проверяет строки, '
+            'разрешает ссылки пакетными запросами и пишет bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=ndjson.CHUNK_SIZE,
+            help='Сколько строк загружать за одну транзакцию.')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Пропустить строки до контрольной точки прерванной '
+                 'загрузки.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        checkpoint = f'{path}.checkpoint'
+        done = 0
+        if options['resume']:
+            state = ndjson.read_checkpoint(checkpoint)
+            if state is None:
+                raise CommandError(f'Нет контрольной точки {checkpoint}.')
+            done = state['line']
+        importer = ndjson.Importer()
+        with open(path, encoding='utf-8') as file:
+            lines = islice(enumerate(file, start=1), done, None)
+            for chunk in chunks(lines, options['chunk_size']):
+                importer.load_chunk(chunk)
+                ndjson.write_checkpoint(checkpoint, {'line': chunk[-1][0]})
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'Загружено строк: {chunk[-1][0]}')
+        importer.finish()
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        for message in importer.errors:
+            self.stderr.write(message)
+        loaded = ', '.join(
+            f'{kind}: {importer.loaded[kind]}' for kind in ndjson.TYPES)
+        self.stdout.write(self.style.SUCCESS(
+            f'Принято записей — {loaded}. '
+            f'Ошибок в строках: {importer.error_count}'))
@@ -0,0 +1,92 @@
+from core import loadtest
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import loadtest as scenario
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест маршрутов posts и авторизации: задержки '
+            'p50/p95/p99 и запросы к базе по маршрутам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode', choices=('inprocess', 'server'), default='server',
+            help='inprocess — вызывать WSGI-приложение напрямую, server — '
+                 'поднять локальный HTTP-сервер.',
+        )
+        parser.add_argument(
+            '--url', help='Адрес уже запущенного сервера вместо своего.')
+        parser.add_argument('--duration', type=float, default=10.0)
+        parser.add_argument(
+            '--requests', type=int,
+            help='Остановиться после стольких запросов.')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--sessions', type=int, default=50,
+            help='Число посетителей, между которыми делятся запросы.')
+        parser.add_argument(
+            '--auth-ratio', type=float, default=0.5,
+            help='Доля посетителей, вошедших на сайт.')
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.1,
+            help='Доля запросов на запись.')
+        parser.add_argument(
+            '--routes', nargs='+', metavar='ROUTE',
+            help='Гонять только эти маршруты.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Сохранить результат в JSON.')
+        parser.add_argument(
+            '--compare', metavar='JSON',
+            help='Сравнить с сохранённым результатом.')
+
+    def handle(self, *args, **options):
+        if settings.DEBUG and not options['url']:
+            self.stderr.write(
+                'DEBUG включён: задержки не отражают работу в бою.')
+        routes = scenario.routes(scenario.Pools())
+        if options['routes']:
+            routes = [route for route in routes
+                      if route.name in options['routes']]
+            if not routes:
+                raise CommandError('Ни один маршрут не подошёл.')
+        scenario.login_user()
+        sessions = scenario.sessions(
+            options['sessions'], options['auth_ratio'], options['seed'])
+        server = None
+        if options['url']:
+            transport = loadtest.HTTPTransport(options['url'])
+        elif options['mode'] == 'server':
+            server, url = loadtest.serve()
+            transport = loadtest.HTTPTransport(url)
+        else:
+            transport = loadtest.ClientTransport()
+        config = {
+            key: options[key] for key in (
+                'mode', 'url', 'duration', 'requests', 'concurrency',
+                'sessions', 'auth_ratio', 'write_ratio', 'routes', 'seed',
+            )
+        }
+        try:
+            result = loadtest.LoadTest(
+                transport, routes, sessions,
+                concurrency=options['concurrency'],
+                duration=options['duration'],
+                requests=options['requests'],
+                write_ratio=options['write_ratio'],
+                seed=options['seed'],
+            ).run()
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+        result['config'] = config
+        if not result['total']:
+            raise CommandError('Не отправлено ни одного запроса.')
+        self.stdout.write(loadtest.report(result))
+        if options['output']:
+            loadtest.save(result, options['output'])
+        if options['compare']:
+            self.stdout.write('')
+            self.stdout.write(loadtest.compare(
+                loadtest.load(options['compare']), result))
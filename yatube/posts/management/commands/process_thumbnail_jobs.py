@@ -0,0 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = ('Выполняет задания очереди превью, оставшиеся после '
+            'перезапуска или падения процесса.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS or 1,
+            help='Число потоков-обработчиков.',
+        )
+
+    def handle(self, *args, **options):
+        job_ids = list(thumbnails.pending_jobs())
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            done = sum(pool.map(thumbnails.run_job, job_ids))
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано заданий: {done} из {len(job_ids)}'
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает полнотекстовый индекс постов и комментариев '
+            'пакетами, каждый в отдельной транзакции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=search.BATCH_SIZE,
+            help='Сколько строк индексировать за одну транзакцию.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Индекс FTS5 есть только в SQLite.')
+        total = 0
+        for indexed in search.rebuild(batch_size=options['batch_size']):
+            total += indexed
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Проиндексировано строк: {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано строк: {total}'
+        ))
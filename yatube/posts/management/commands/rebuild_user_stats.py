@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats, versions
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько пользователей пересчитывать за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        fixed = stats.rebuild(batch_size=options['batch_size'])
+        if fixed:
+            versions.bump(versions.SITE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено записей счётчиков: {fixed}'
+        ))
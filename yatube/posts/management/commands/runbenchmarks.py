@@ -0,0 +1,57 @@
+from core import benchmarks
+from core.test_runner import TestRunner
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmarks as suite
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет микробенчмарки view-функций и шаблонов на '
+            'тестовой базе и сравнивает их с сохранённой базовой линией.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names', nargs='*', metavar='NAME',
+            help='Прогнать только эти бенчмарки.')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--threshold', type=float,
+            default=settings.BENCHMARK_THRESHOLD,
+            help='Допустимое замедление, доля базовой линии.')
+        parser.add_argument('--baseline', default=suite.BASELINE)
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Записать результаты как новую базовую линию.')
+
+    def handle(self, *args, **options):
+        runner = TestRunner(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            results = benchmarks.run(
+                suite.__name__, options['repeat'], options['names'])
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+        if not results['benchmarks']:
+            raise CommandError('Ни один бенчмарк не подошёл.')
+        baseline = benchmarks.load(options['baseline'])
+        self.stdout.write(benchmarks.report(results, baseline))
+        if options['update_baseline']:
+            benchmarks.save({
+                'calibration_ms': results['calibration_ms'],
+                'benchmarks': {
+                    **baseline.get('benchmarks', {}),
+                    **results['benchmarks'],
+                },
+            }, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовая линия записана в {options["baseline"]}'))
+            return
+        found = benchmarks.regressions(
+            baseline, results, options['threshold'])
+        if found:
+            raise CommandError(
+                'Регрессии производительности:\n' + '\n'.join(found))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
@@ -0,0 +1,68 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.bulk import chunks
+from posts.models import Post, ThumbnailJob
+
+
+def warm_chunk(post_images):
+    """Генерирует превью в дочернем процессе, возвращает готовые посты."""
+    done = []
+    for post_id, image in post_images:
+        try:
+            thumbnails.generate(post_id, image)
+        except Exception:
+            thumbnails.logger.exception('Не удалось создать превью %s', image)
+            continue
+        done.append((post_id, image))
+    connections.close_all()
+    return done
+
+
+class Command(BaseCommand):
+    help = 'Заранее генерирует превью картинок существующих постов.'
+    worker = staticmethod(warm_chunk)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов; по умолчанию по числу ядер.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=20,
+            help='Сколько картинок отдавать процессу за раз.',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Генерировать и для постов с готовыми превью.',
+        )
+
+    def get_posts(self, force):
+        posts = Post.objects.exclude(image='').order_by('pk')
+        if not force:
+            posts = posts.exclude(thumbnail_job__status=ThumbnailJob.DONE)
+        return posts
+
+    def finish(self, done):
+        thumbnails.mark_done(done)
+
+    def handle(self, *args, **options):
+        posts = list(
+            self.get_posts(options['force']).values_list('pk', 'image'))
+        # Соединения не должны наследоваться дочерними процессами.
+        connections.close_all()
+        processed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for done in pool.map(
+                self.worker, chunks(posts, options['chunk_size'])
+            ):
+                if done:
+                    self.finish(done)
+                processed += len(done)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {processed} из {len(posts)}'
+        ))
@@ -0,0 +1,148 @@
+import hashlib
+
+from core import executor, holes, metrics, stampede
+from core.middleware import HybridMiddleware
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from . import versions
+
+PAGE_TIMEOUT = 60 * 60 * 24
+# Cookie, при которой в странице могут быть сообщения для посетителя.
+MESSAGES_COOKIE = 'messages'
+
+
+class PageCacheMiddleware(HybridMiddleware):
+    """Кеширует общую для всех посетителей часть страниц.
+
+    Кешируются view-функции с view.page_scopes (см.
+    versions.conditional_page). Всё, что зависит от пользователя,
+    выводится тегом {% hole %}: в кеш попадает страница с метками
+    на месте дырок, а при попадании дырки рендерятся для текущего
+    запроса (core.holes). В ключ входят адрес с параметрами и штампы
+    версий областей страницы, поэтому изменения, о которых сообщают
+    сигналы, сразу уводят на новый ключ; тайм-аут лишь ограничивает
+    жизнь забытых записей.
+
+    После изменения новую версию страницы рендерит один воркер под
+    блокировкой (core.stampede), остальные до её готовности отдают
+    последнюю закешированную версию без валидаторов.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if self.is_async:
+            self.process_view = self.aprocess_view
+
+    def call(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            if getattr(request, 'page_cache_locked', False):
+                stampede.release(request.page_cache_key)
+        if self.storable(request, response):
+            self.store(request, response)
+        return response
+
+    async def acall(self, request):
+        try:
+            response = await self.get_response(request)
+        finally:
+            if getattr(request, 'page_cache_locked', False):
+                await executor.run(stampede.release, request.page_cache_key)
+        if self.storable(request, response):
+            await executor.run(self.store, request, response)
+        return response
+
+    def storable(self, request, response):
+        return (getattr(request, 'page_cache_key', None)
+                and self.cacheable(response))
+
+    def store(self, request, response):
+        shared, personal = holes.split(response.content.decode())
+        if 'csrfmiddlewaretoken' not in shared:
+            entry = (response['Content-Type'], shared)
+            cache.set_many({
+                request.page_cache_key: entry,
+                self.latest_key(request): entry,
+            }, PAGE_TIMEOUT)
+        response.content = personal
+
+    def latest_key(self, request):
+        """Ключ последней закешированной версии страницы."""
+        return 'page:latest:{}:{}'.format(
+            request.resolver_match.view_name,
+            hashlib.md5(request.get_full_path().encode()).hexdigest(),
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.applies(request, view_func):
+            return None
+        return self.cached_response(
+            request, view_func.page_scopes, view_args, view_kwargs)
+
+    async def aprocess_view(self, request, view_func, view_args,
+                            view_kwargs):
+        if not self.applies(request, view_func):
+            return None
+        return await executor.run(
+            self.cached_response,
+            request, view_func.page_scopes, view_args, view_kwargs)
+
+    def applies(self, request, view_func):
+        return (
+            hasattr(view_func, 'page_scopes')
+            and request.method in ('GET', 'HEAD')
+            and MESSAGES_COOKIE not in request.COOKIES
+        )
+
+    def cached_response(self, request, scopes_func, view_args, view_kwargs):
+        """Страница из кеша, устаревшая страница на время рендера или
+        None, если view должна отрендерить её сама."""
+        current = versions.page_stamps(
+            request, scopes_func, view_args, view_kwargs)
+        if current is None:
+            return None
+        state = repr((sorted(current.items()), request.get_full_path()))
+        key = 'page:{}:{}'.format(
+            request.resolver_match.view_name,
+            hashlib.md5(state.encode()).hexdigest(),
+        )
+        cached = cache.get(key)
+        if cached is None:
+            if stampede.acquire(key):
+                request.page_cache_locked = True
+                metrics.count(stampede.METRIC, 'computed')
+            else:
+                stale = cache.get(self.latest_key(request))
+                if stale is not None:
+                    metrics.count(stampede.METRIC, 'stale')
+                    content_type, shared = stale
+                    return HttpResponse(
+                        holes.fill(request, shared),
+                        content_type=content_type)
+            request.page_cache_key = key
+            request.collect_holes = True
+            return None
+        etag, last_modified = versions.validators(
+            request, scopes_func, view_args, view_kwargs)
+        last_modified = int(last_modified.timestamp())
+        content_type, shared = cached
+        response = HttpResponse(
+            holes.fill(request, shared), content_type=content_type)
+        response['ETag'] = f'"{etag}"'
+        response['Last-Modified'] = http_date(last_modified)
+        return get_conditional_response(
+            request, etag=response['ETag'], last_modified=last_modified,
+            response=response,
+        )
+
+    def cacheable(self, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and response['Content-Type'].startswith('text/html')
+        )
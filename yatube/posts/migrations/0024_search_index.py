@@ -0,0 +1,92 @@
+from django.db import migrations
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE posts_search USING fts5(
+        text, kind UNINDEXED, post_id UNINDEXED, tokenize='unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER posts_search_post_insert AFTER INSERT ON posts_post
+    BEGIN
+        INSERT INTO posts_search(rowid, text, kind, post_id)
+        VALUES (new.id * 2, new.text, 'post', new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_search_post_update AFTER UPDATE OF text
+    ON posts_post
+    BEGIN
+        UPDATE posts_search SET text = new.text WHERE rowid = new.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_search_post_delete AFTER DELETE ON posts_post
+    BEGIN
+        DELETE FROM posts_search WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_search_comment_insert AFTER INSERT ON posts_comment
+    WHEN new.post_id IS NOT NULL
+    BEGIN
+        INSERT INTO posts_search(rowid, text, kind, post_id)
+        VALUES (new.id * 2 + 1, new.text, 'comment', new.post_id);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_search_comment_update AFTER UPDATE OF text, post_id
+    ON posts_comment
+    BEGIN
+        DELETE FROM posts_search WHERE rowid = old.id * 2 + 1;
+        INSERT INTO posts_search(rowid, text, kind, post_id)
+        SELECT new.id * 2 + 1, new.text, 'comment', new.post_id
+        WHERE new.post_id IS NOT NULL;
+    END
+    """,
+    """
+    CREATE TRIGGER posts_search_comment_delete AFTER DELETE ON posts_comment
+    BEGIN
+        DELETE FROM posts_search WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+    """
+    INSERT INTO posts_search(rowid, text, kind, post_id)
+    SELECT id * 2, text, 'post', id FROM posts_post
+    """,
+    """
+    INSERT INTO posts_search(rowid, text, kind, post_id)
+    SELECT id * 2 + 1, text, 'comment', post_id FROM posts_comment
+    WHERE post_id IS NOT NULL
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS posts_search_post_insert',
+    'DROP TRIGGER IF EXISTS posts_search_post_update',
+    'DROP TRIGGER IF EXISTS posts_search_post_delete',
+    'DROP TRIGGER IF EXISTS posts_search_comment_insert',
+    'DROP TRIGGER IF EXISTS posts_search_comment_update',
+    'DROP TRIGGER IF EXISTS posts_search_comment_delete',
+    'DROP TABLE IF EXISTS posts_search',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE_SQL), run(DROP_SQL)),
+    ]
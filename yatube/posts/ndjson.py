@@ -0,0 +1,331 @@
+import json
+import os
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import stats, timeline, versions
+from .bulk import explicit_dates, in_chunks
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+CHUNK_SIZE = 1000
+# Порядок типов: ссылки в записях указывают только на предыдущие типы.
+TYPES = ('group', 'user', 'post', 'comment', 'follow')
+# Сколько ошибок строк запоминать для отчёта; остальные только считаются.
+MAX_REPORTED_ERRORS = 20
+
+# Тип записи: (выборка, колонки). Ссылки выгружаются естественными
+# ключами: имя пользователя, slug группы, id поста.
+EXPORT = {
+    'group': (Group.objects.all(), ('slug', 'title', 'description')),
+    'user': (User.objects.all(), (
+        'username', 'first_name', 'last_name', 'email', 'password',
+        'is_active', 'date_joined',
+    )),
+    'post': (Post.objects.all(), (
+        'id', 'author__username', 'group__slug', 'text', 'image', 'created',
+        'updated',
+    )),
+    'comment': (Comment.objects.filter(post__isnull=False), (
+        'id', 'post_id', 'author__username', 'text', 'created',
+    )),
+    'follow': (Follow.objects.all(), ('user__username', 'author__username')),
+}
+RENAMED = {
+    'author__username': 'author',
+    'user__username': 'user',
+    'group__slug': 'group',
+    'post_id': 'post',
+}
+
+REQUIRED = {
+    'group': ('slug', 'title'),
+    'user': ('username',),
+    'post': ('id', 'author', 'text'),
+    'comment': ('id', 'post', 'author', 'text'),
+    'follow': ('user', 'author'),
+}
+
+
+class Encoder(DjangoJSONEncoder):
+    """Даты с микросекундами: DjangoJSONEncoder обрезает их до
+    миллисекунд, и восстановленные посты поменяли бы порядок."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def dumps(record):
+    return json.dumps(record, cls=Encoder, ensure_ascii=False)
+
+
+def export_chunks(kind, last_pk=0, chunk_size=CHUNK_SIZE):
+    """Записи типа kind пачками по возрастанию pk после last_pk.
+
+    Возвращает генератор пар (pk последней записи, строки NDJSON).
+    Каждая пачка читается отдельным запросом по индексу pk, поэтому
+    память не зависит от размера таблицы.
+    """
+    queryset, fields = EXPORT[kind]
+    rows = queryset.order_by('pk').values_list('pk', *fields)
+    names = [RENAMED.get(field, field) for field in fields]
+    while True:
+        batch = list(rows.filter(pk__gt=last_pk)[:chunk_size])
+        if not batch:
+            return
+        last_pk = batch[-1][0]
+        yield last_pk, [
+            dumps({'type': kind, **dict(zip(names, row[1:]))})
+            for row in batch
+        ]
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, state):
+    """Атомарно сохраняет состояние, чтобы обрыв не оставил половину."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as file:
+        json.dump(state, file)
+    os.replace(temp, path)
+
+
+class RowError(Exception):
+    pass
+
+
+def parse(line):
+    """Тип и данные записи из строки NDJSON."""
+    try:
+        record = json.loads(line)
+    except ValueError as error:
+        raise RowError(f'неверный JSON: {error}')
+    if not isinstance(record, dict):
+        raise RowError('запись должна быть объектом')
+    kind = record.pop('type', None)
+    if kind not in REQUIRED:
+        raise RowError(f'неизвестный тип {kind!r}')
+    missing = [field for field in REQUIRED[kind]
+               if record.get(field) in (None, '')]
+    if missing:
+        raise RowError(f'нет полей: {", ".join(missing)}')
+    return kind, record
+
+
+def _validated(obj, exclude):
+    try:
+        obj.clean_fields(exclude=exclude)
+    except ValidationError as error:
+        raise RowError('; '.join(
+            f'{field}: {" ".join(messages)}'
+            for field, messages in error.message_dict.items()))
+    return obj
+
+
+def _lookup(queryset, field, values):
+    """{значение поля: pk} для строк с данными значениями поля."""
+    found = {}
+    for batch in in_chunks(values):
+        found.update(queryset.filter(
+            **{f'{field}__in': batch}).values_list(field, 'pk'))
+    return found
+
+
+class Importer:
+    """Загружает NDJSON пачками строк, каждую в своей транзакции.
+
+    Записи создаются через bulk_create с ignore_conflicts, поэтому
+    повторная загрузка пачки после обрыва ничего не дублирует.
+    """
+
+    def __init__(self):
+        self.loaded = defaultdict(int)
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f'строка {number}: {message}')
+
+    def load_chunk(self, lines):
+        """lines — пары (номер строки, текст)."""
+        records = defaultdict(list)
+        for number, line in lines:
+            if not line.strip():
+                continue
+            try:
+                kind, record = parse(line)
+            except RowError as error:
+                self.error(number, error)
+                continue
+            records[kind].append((number, record))
+        date_fields = [
+            Post._meta.get_field('created'), Post._meta.get_field('updated'),
+            Comment._meta.get_field('created'),
+        ]
+        with transaction.atomic(), explicit_dates(*date_fields):
+            for kind in TYPES:
+                if records[kind]:
+                    getattr(self, f'load_{kind}s')(records[kind])
+
+    def build(self, kind, rows, make):
+        """Объекты из записей; невалидные записи попадают в ошибки."""
+        objects = []
+        for number, record in rows:
+            try:
+                objects.append(make(record))
+            except RowError as error:
+                self.error(number, error)
+        self.loaded[kind] += len(objects)
+        return objects
+
+    def user_ids(self, rows, *fields):
+        names = {record[field] for _, record in rows for field in fields}
+        return _lookup(User.objects.all(), 'username', names)
+
+    @staticmethod
+    def resolve(mapping, value, what):
+        if value not in mapping:
+            raise RowError(f'{what} {value!r} не найден')
+        return mapping[value]
+
+    def load_groups(self, rows):
+        def make(record):
+            return _validated(Group(
+                slug=record['slug'], title=record['title'],
+                description=record.get('description') or '',
+            ), exclude=[])
+        Group.objects.bulk_create(
+            self.build('group', rows, make), ignore_conflicts=True)
+
+    def load_users(self, rows):
+        def make(record):
+            user = User(**{
+                field: record[field] for field in (
+                    'username', 'first_name', 'last_name', 'email',
+                    'password', 'is_active', 'date_joined',
+                ) if record.get(field) is not None
+            })
+            if not user.password:
+                user.set_unusable_password()
+            return _validated(user, exclude=['last_login'])
+        User.objects.bulk_create(
+            self.build('user', rows, make), ignore_conflicts=True)
+
+    def load_posts(self, rows):
+        authors = self.user_ids(rows, 'author')
+        slugs = {record['group'] for _, record in rows if record.get('group')}
+        groups = _lookup(Group.objects.all(), 'slug', slugs)
+
+        def make(record):
+            created = record.get('created') or timezone.now()
+            post = Post(
+                id=record['id'],
+                author_id=self.resolve(authors, record['author'], 'автор'),
+                group_id=(
+                    self.resolve(groups, record['group'], 'группа')
+                    if record.get('group') else None),
+                text=record['text'],
+                image=record.get('image') or '',
+                created=created,
+                updated=record.get('updated') or created,
+            )
+            return _validated(post, exclude=['author', 'group'])
+        posts = self.build('post', rows, make)
+        Post.objects.bulk_create(posts, ignore_conflicts=True)
+        timeline.fan_out_posts(posts)
+
+    def load_comments(self, rows):
+        authors = self.user_ids(rows, 'author')
+        post_ids = set(_lookup(
+            Post.objects.all(), 'pk', {record['post'] for _, record in rows}))
+
+        def make(record):
+            if record['post'] not in post_ids:
+                raise RowError(f'пост {record["post"]!r} не найден')
+            comment = Comment(
+                id=record['id'],
+                post_id=record['post'],
+                author_id=self.resolve(authors, record['author'], 'автор'),
+                text=record['text'],
+                created=record.get('created') or timezone.now(),
+            )
+            return _validated(comment, exclude=['post', 'author'])
+        comments = self.build('comment', rows, make)
+        Comment.objects.bulk_create(comments, ignore_conflicts=True)
+        counts = Comment.objects.filter(
+            post_id=OuterRef('pk')
+        ).order_by().values('post_id').annotate(
+            total=Count('pk')).values('total')
+        for post_ids in in_chunks({comment.post_id for comment in comments}):
+            Post.objects.filter(pk__in=post_ids).update(
+                comments_count=Coalesce(
+                    Subquery(counts, output_field=IntegerField()), 0))
+
+    def load_follows(self, rows):
+        users = self.user_ids(rows, 'user', 'author')
+        # Материализованных подписчиков у автора не больше лимита,
+        # как при подписке через сайт (timeline.use_fanout).
+        fanout_counts = {}
+        for author_ids in in_chunks(users.values()):
+            fanout_counts.update(Follow.objects.filter(
+                author_id__in=author_ids, fanout=True,
+            ).values('author_id').annotate(
+                total=Count('pk')).values_list('author_id', 'total'))
+
+        def make(record):
+            user_id = self.resolve(users, record['user'], 'подписчик')
+            author_id = self.resolve(users, record['author'], 'автор')
+            if user_id == author_id:
+                raise RowError('подписка на самого себя')
+            return Follow(user_id=user_id, author_id=author_id)
+        follows = self.build('follow', rows, make)
+        existing = set()
+        for batch in in_chunks(follows, lists=2):
+            existing.update(Follow.objects.filter(
+                user_id__in={follow.user_id for follow in batch},
+                author_id__in={follow.author_id for follow in batch},
+            ).values_list('user_id', 'author_id'))
+        follows = [
+            follow for follow in follows
+            if (follow.user_id, follow.author_id) not in existing
+        ]
+        for follow in follows:
+            count = fanout_counts.get(follow.author_id, 0)
+            follow.fanout = count < settings.TIMELINE_FANOUT_LIMIT
+            fanout_counts[follow.author_id] = count + follow.fanout
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        timeline.backfill_many(follows)
+
+    def finish(self):
+        """Пересчитывает производные данные после загрузки."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Post, Comment])
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+        stats.rebuild()
+        versions.bump(versions.SITE)
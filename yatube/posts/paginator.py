@@ -0,0 +1,169 @@
+import base64
+import binascii
+import collections.abc
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage(collections.abc.Sequence):
+    """Страница keyset-пагинации без общего числа записей."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<CursorPage of %s objects>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.encode_cursor(self.object_list[0])
+
+
+class CursorPaginator:
+    """Keyset-пагинация по упорядоченному набору полей.
+
+    Вместо OFFSET и COUNT(*) страница выбирается условием по значениям
+    ключа последней (или первой) записи предыдущей страницы, поэтому
+    глубина страницы не влияет на стоимость запроса. Ключ должен быть
+    уникальным, поэтому последним полем обычно идёт первичный ключ.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-created', '-id')):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = tuple(field.lstrip('-') for field in self.ordering)
+
+    @property
+    def model(self):
+        return self.object_list.model
+
+    def encode_cursor(self, obj):
+        if isinstance(obj, dict):
+            # Строка values(): value_to_string ждёт объект модели.
+            obj = self.model(**{field: obj[field] for field in self.fields})
+        values = [
+            self.model._meta.get_field(field).value_to_string(obj)
+            for field in self.fields
+        ]
+        token = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(token).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if len(values) != len(self.fields):
+                raise InvalidCursor(token)
+            return [
+                self.model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            raise InvalidCursor(token)
+
+    def _seek(self, values, backwards):
+        """Условие «строго после курсора» в порядке обхода."""
+        lookups = []
+        for field in self.ordering:
+            descending = field.startswith('-')
+            lookups.append('lt' if descending != backwards else 'gt')
+        conditions = []
+        for position, lookup in enumerate(lookups):
+            condition = Q(**{
+                f'{self.fields[position]}__{lookup}': values[position]
+            })
+            for field, value in zip(self.fields[:position], values):
+                condition &= Q(**{field: value})
+            conditions.append(condition)
+        # Нестрогое условие по первому полю дублирует OR-ветки, но даёт
+        # планировщику диапазон по индексу вместо полного сканирования.
+        first = Q(**{
+            f'{self.fields[0]}__{lookups[0]}e': values[0]
+        })
+        return first & reduce(or_, conditions)
+
+    def _reversed_ordering(self):
+        return [
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in self.ordering
+        ]
+
+    def window(self, values=None, backwards=False, limit=None):
+        """QuerySet до limit строк после курсора в порядке обхода."""
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+        if backwards:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        return queryset[:limit]
+
+    def fetch(self, values=None, backwards=False, limit=None):
+        """Возвращает до limit объектов после курсора в порядке выдачи."""
+        rows = list(self.window(values, backwards, limit))
+        if backwards:
+            rows.reverse()
+        return rows
+
+    def get_page(self, after=None, before=None):
+        """Страница после курсора after или перед курсором before.
+
+        Некорректный курсор приводит к первой странице, как и переход
+        назад от начала выдачи.
+        """
+        try:
+            if before:
+                rows = self.fetch(self.decode_cursor(before), backwards=True,
+                                  limit=self.per_page + 1)
+                if len(rows) > self.per_page:
+                    return CursorPage(rows[1:], self,
+                                      has_next=True, has_previous=True)
+            elif after:
+                rows = self.fetch(self.decode_cursor(after),
+                                  limit=self.per_page + 1)
+                return CursorPage(rows[:self.per_page], self,
+                                  has_next=len(rows) > self.per_page,
+                                  has_previous=True)
+        except InvalidCursor:
+            pass
+        rows = self.fetch(limit=self.per_page + 1)
+        return CursorPage(rows[:self.per_page], self,
+                          has_next=len(rows) > self.per_page,
+                          has_previous=False)
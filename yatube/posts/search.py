@@ -0,0 +1,144 @@
+import base64
+import binascii
+import hashlib
+import json
+import re
+
+from core import stampede
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from django.utils.functional import cached_property
+
+from . import cards
+from .models import Comment, Post
+from .paginator import CursorPaginator, InvalidCursor
+
+TABLE = 'posts_search'
+BATCH_SIZE = 1000
+# Сколько секунд число найденных постов может отставать от индекса.
+COUNT_TIMEOUT = 60
+
+_WORD = re.compile(r'\w+')
+
+
+def match_expression(query):
+    """Строка пользователя в запросе FTS5: каждое слово — префиксный
+    поиск, все слова обязательны. Операторы FTS5 не пропускаются."""
+    words = _WORD.findall(query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def post_ids_subquery(query):
+    """Id постов, в тексте или комментариях которых есть запрос."""
+    return RawSQL(
+        f'SELECT post_id FROM {TABLE} WHERE {TABLE} MATCH %s',
+        [match_expression(query)],
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """Keyset-пагинация результатов поиска по релевантности (bm25)
+    лучшего совпадения в посте или его комментариях.
+
+    Ключ — (ранг, id поста): страница выбирается условием по ключу
+    последнего поста предыдущей, без OFFSET и ссылок на все страницы.
+    """
+
+    def __init__(self, query, per_page):
+        self.expression = match_expression(query)
+        self.per_page = per_page
+
+    @cached_property
+    def count(self):
+        """Число найденных постов. Подсчёт перебирает все совпадения,
+        поэтому кешируется на COUNT_TIMEOUT и считается одним воркером."""
+        if not self.expression:
+            return 0
+        digest = hashlib.md5(self.expression.encode()).hexdigest()
+        return stampede.get_or_set(
+            f'search_count:{digest}', self._count, COUNT_TIMEOUT)
+
+    def _count(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(DISTINCT post_id) FROM {TABLE} '
+                f'WHERE {TABLE} MATCH %s',
+                [self.expression],
+            )
+            return cursor.fetchone()[0]
+
+    def encode_cursor(self, post):
+        token = json.dumps([post.search_rank, post.pk]).encode()
+        return base64.urlsafe_b64encode(token).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            rank, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return [float(rank), int(pk)]
+        except (ValueError, TypeError, binascii.Error):
+            raise InvalidCursor(token)
+
+    def fetch(self, values=None, backwards=False, limit=None):
+        if not self.expression:
+            return []
+        having = ''
+        params = [self.expression]
+        if values is not None:
+            having = 'HAVING (min(rank), post_id) {} (%s, %s) '.format(
+                '<' if backwards else '>')
+            params += values
+        order = 'DESC' if backwards else 'ASC'
+        params.append(-1 if limit is None else limit)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id, min(rank) FROM {TABLE} '
+                f'WHERE {TABLE} MATCH %s GROUP BY post_id {having}'
+                f'ORDER BY min(rank) {order}, post_id {order} LIMIT %s',
+                params,
+            )
+            ranks = dict(cursor.fetchall())
+        posts = cards.for_cards(Post.objects.order_by()).in_bulk(ranks)
+        rows = []
+        for pk, rank in ranks.items():
+            if pk in posts:
+                posts[pk].search_rank = rank
+                rows.append(posts[pk])
+        if backwards:
+            rows.reverse()
+        return rows
+
+
+def _index_batches(queryset, post_field, kind, offset, batch_size):
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                queryset.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', 'text', post_field)[:batch_size]
+            )
+            if not rows:
+                return
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT OR REPLACE INTO {TABLE}'
+                    f'(rowid, text, kind, post_id) VALUES (%s, %s, %s, %s)',
+                    [(pk * 2 + offset, text, kind, post_id)
+                     for pk, text, post_id in rows],
+                )
+        last_pk = rows[-1][0]
+        yield len(rows)
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """Перестраивает поисковый индекс пакетами, каждый в своей транзакции.
+
+    Возвращает генератор числа проиндексированных строк по пакетам.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+    yield from _index_batches(
+        Post.objects.all(), 'pk', 'post', 0, batch_size)
+    yield from _index_batches(
+        Comment.objects.filter(post__isnull=False), 'post_id', 'comment', 1,
+        batch_size)
@@ -0,0 +1,116 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import cards, stats, thumbnails, timeline, versions
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+CARD_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is None or CARD_USER_FIELDS & set(update_fields):
+        cards.touch_posts(author=instance)
+        versions.bump(versions.SITE)
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, created, **kwargs):
+    if not created:
+        cards.touch_posts(group=instance)
+        versions.bump(versions.SITE)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    cards.touch_posts(group=instance)
+    versions.bump(versions.SITE)
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    if not instance._state.adding:
+        cards.invalidate(instance)
+        versions.bump_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        stats.increment(instance.author_id, posts_count=1)
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        thumbnails.enqueue(instance)
+    versions.bump(*versions.post_scopes(
+        instance.author_id, instance.group_id, instance.pk))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    stats.increment(instance.author_id, posts_count=-1)
+    cards.invalidate(instance)
+    versions.bump(*versions.post_scopes(
+        instance.author_id, instance.group_id, instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        stats.increment(instance.author_id, comments_count=1)
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1)
+        versions.bump(versions.post(instance.post_id),
+                      versions.author(instance.author_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    stats.increment(instance.author_id, comments_count=-1)
+    Post.objects.filter(pk=instance.post_id).update(
+        comments_count=Greatest(F('comments_count') - 1, 0))
+    versions.bump(
+        versions.post(instance.post_id), versions.author(instance.author_id))
+
+
+@receiver(pre_save, sender=Follow)
+def follow_mode(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance.fanout = timeline.use_fanout(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        stats.increment(instance.author_id, followers_count=1)
+        stats.increment(instance.user_id, following_count=1)
+        timeline.backfill(instance)
+        versions.bump(
+            versions.author(instance.author_id),
+            versions.author(instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    stats.increment(instance.author_id, followers_count=-1)
+    stats.increment(instance.user_id, following_count=-1)
+    timeline.prune(instance)
+    versions.bump(
+        versions.author(instance.author_id), versions.author(instance.user_id))
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'comments_count': (Comment, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def for_user(user):
+    """Счётчики пользователя.
+
+    Если записи нет (пользователь загружен из фикстуры или bulk_create),
+    она создаётся по фактическим данным.
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        actual = {
+            field: model.objects.filter(**{lookup: user}).count()
+            for field, (model, lookup) in COUNTERS.items()
+        }
+        stats, _ = UserStats.objects.get_or_create(
+            user_id=user.pk, defaults=actual
+        )
+        return stats
+
+
+def increment(user_id, **deltas):
+    """Атомарно изменяет счётчики пользователя на заданные величины."""
+    UserStats.objects.filter(user_id=user_id).update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
+
+
+def _count_subquery(model, field):
+    counts = model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(
+        Subquery(counts, output_field=IntegerField()), 0
+    )
+
+
+def rebuild(batch_size=500):
+    """Пересчитывает счётчики всех пользователей.
+
+    Возвращает число записей, которые пришлось создать или исправить.
+    """
+    users = User.objects.order_by('pk').annotate(**{
+        field: _count_subquery(model, lookup)
+        for field, (model, lookup) in COUNTERS.items()
+    }).values('pk', *COUNTERS)
+    fixed = 0
+    last_pk = 0
+    while True:
+        batch = list(users.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return fixed
+        last_pk = batch[-1]['pk']
+        existing = UserStats.objects.in_bulk([row['pk'] for row in batch])
+        missing, drifted = [], []
+        for row in batch:
+            actual = {field: row[field] for field in COUNTERS}
+            stats = existing.get(row['pk'])
+            if stats is None:
+                missing.append(UserStats(user_id=row['pk'], **actual))
+            elif any(getattr(stats, field) != value
+                     for field, value in actual.items()):
+                for field, value in actual.items():
+                    setattr(stats, field, value)
+                drifted.append(stats)
+        UserStats.objects.bulk_create(missing, ignore_conflicts=True)
+        UserStats.objects.bulk_update(drifted, list(COUNTERS))
+        fixed += len(missing) + len(drifted)
@@ -0,0 +1,10 @@
+from django import template
+
+from posts import cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, variant='feed'):
+    return cards.render_cards(list(posts), variant)
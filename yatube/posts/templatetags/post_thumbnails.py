@@ -0,0 +1,19 @@
+from django import template
+
+from posts import thumbnails, variants
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def card_thumbnail(context, image):
+    """Превью из заранее собранной карты thumbnails, если она есть."""
+    prefetched = context.get('thumbnails')
+    if prefetched is not None and image.name in prefetched:
+        return prefetched[image.name]
+    return thumbnails.lookup(image)
+
+
+@register.simple_tag
+def image_srcset(post, fmt='webp'):
+    return variants.srcset(post, fmt)
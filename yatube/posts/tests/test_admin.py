@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='Admin', email='admin@example.com', password='admin')
+        cls.post = Post.objects.create(
+            author=cls.admin, text='Поиск в админке')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def search(self, term):
+        return self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': term})
+
+    def test_search_uses_index(self):
+        response = self.search('админк')
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.post])
+
+    def test_search_without_words(self):
+        """Запрос из одних знаков препинания ничего не находит."""
+        response = self.search('!!!')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['cl'].result_list), [])
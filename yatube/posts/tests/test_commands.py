@@ -0,0 +1,69 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from posts import search
+from posts.models import Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class GenerateDatasetTests(TestCase):
+    def generate(self, prefix):
+        call_command(
+            'generate_dataset', users=20, posts=200, groups=3, follows=4,
+            seed=7, prefix=prefix, chunk_size=50, stdout=StringIO(),
+        )
+        return Post.objects.filter(author__username__startswith=prefix)
+
+    def test_dataset_consistent(self):
+        """Счётчики, ленты и поиск согласованы со сгенерированными
+        строками."""
+        posts = self.generate('gen')
+        self.assertEqual(posts.count(), 200)
+        for post in posts.filter(comments_count__gt=0)[:10]:
+            self.assertEqual(post.comments.count(), post.comments_count)
+        author = User.objects.filter(
+            username__startswith='gen', posts__isnull=False).first()
+        self.assertEqual(author.stats.posts_count, author.posts.count())
+        follow = Follow.objects.filter(
+            user__username__startswith='gen', fanout=True).first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user=follow.user, author=follow.author).count(),
+            follow.author.posts.count(),
+        )
+        self.assertGreater(
+            search.SearchPaginator(posts.first().text, 1).count, 0)
+
+    def test_same_seed_same_data(self):
+        """Один seed даёт одинаковые данные."""
+        def shape(prefix):
+            return [
+                (post.text, post.author.username[len(prefix):],
+                 post.comments_count, post.created)
+                for post in self.generate(prefix).select_related(
+                    'author').order_by('pk')
+            ]
+        self.assertEqual(shape('one'), shape('two'))
+
+
+class LoadTestCommandTests(TestCase):
+    def test_loadtest_in_process(self):
+        """Нагрузочный тест проходит по маршрутам и пишет JSON."""
+        author = User.objects.create_user(username='LoadAuthor')
+        group = Group.objects.create(title='Load', slug='load')
+        Post.objects.create(author=author, group=group, text='Нагрузка')
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command(
+                'loadtest', mode='inprocess', concurrency=1, requests=60,
+                sessions=4, write_ratio=0.3, output=output.name,
+                stdout=StringIO(), stderr=StringIO(),
+            )
+            result = json.load(output)
+        self.assertEqual(result['total']['requests'], 60)
+        self.assertEqual(result['total']['errors'], 0)
+        self.assertIn('p99_ms', result['routes']['posts:index'])
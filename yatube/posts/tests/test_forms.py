@@ -3,10 +3,12 @@ import tempfile
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-from posts.models import Comment, Post
+from posts import thumbnails
+from posts.models import Comment, Post, ThumbnailJob
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -112,3 +114,70 @@ class PostCreateFormTests(TestCase):
                 text=form_data['text'],
             ).exists()
         )
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_create_post_generates_thumbnail(self):
+        """Превью картинки создаётся после сохранения формы,
+        а до этого лента показывает заглушку."""
+        uploaded = SimpleUploadedFile(
+            name='thumb.gif',
+            content=(
+                b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00'
+                b'\x00\x21\xf9\x04\x01\x0a\x00\x01\x00\x2c\x00\x00'
+                b'\x00\x00\x01\x00\x01\x00\x00\x02\x02\x4c\x01\x00\x3b'
+            ),
+            content_type='image/gif'
+        )
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'Post with image', 'image': uploaded},
+            )
+        post = Post.objects.get(text='Post with image')
+        self.assertIsNone(thumbnails.lookup(post.image))
+        content = self.authorized_client.get(
+            reverse('posts:post_detail', args=[post.id])).content.decode()
+        self.assertIn('img/placeholder.svg', content)
+
+        for callback in callbacks:
+            callback()
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnail_job.status, ThumbnailJob.DONE)
+        self.assertIsNotNone(thumbnails.lookup(post.image))
+        self.assertEqual(
+            sorted(post.image_variants.values_list('format', 'width')),
+            [('webp', 320), ('webp', 640), ('webp', 960)],
+        )
+        content = self.authorized_client.get(
+            reverse('posts:post_detail', args=[post.id])).content.decode()
+        self.assertIn('type="image/webp"', content)
+        self.assertIn('-640.webp 640w', content)
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_thumbnails_resolved_in_one_query(self):
+        """Превью всей страницы читаются одним запросом к хранилищу."""
+        images = []
+        for name in ('first.gif', 'second.gif', 'third.gif'):
+            with self.captureOnCommitCallbacks(execute=True):
+                post = Post.objects.create(
+                    author=self.user,
+                    text=name,
+                    image=SimpleUploadedFile(
+                        name=name,
+                        content=(
+                            b'\x47\x49\x46\x38\x39\x61\x01\x00\x01'
+                            b'\x00\x00\x00\x00\x21\xf9\x04\x01\x0a'
+                            b'\x00\x01\x00\x2c\x00\x00\x00\x00\x01'
+                            b'\x00\x01\x00\x00\x02\x02\x4c\x01\x00'
+                            b'\x3b'
+                        ),
+                        content_type='image/gif',
+                    ),
+                )
+            images.append(post.image.name)
+        cache.clear()
+        with self.assertNumQueries(1):
+            previews = thumbnails.lookup_many(images)
+        self.assertTrue(all(previews[image] for image in images))
+        with self.assertNumQueries(0):
+            thumbnails.lookup_many(images)
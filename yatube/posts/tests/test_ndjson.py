@@ -0,0 +1,136 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from posts import bulk, ndjson
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class NdjsonTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='NdAuthor')
+        cls.reader = User.objects.create_user(username='NdReader')
+        cls.group = Group.objects.create(
+            title='Nd', slug='nd', description='Группа')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Экспорт')
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = f'{self.directory}/dump.ndjson'
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка восстанавливают посты и производные
+        данные."""
+        call_command('export_ndjson', self.path, chunk_size=1,
+                     stdout=StringIO())
+        created = self.post.created
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        call_command('import_ndjson', self.path, chunk_size=2,
+                     stdout=StringIO(), stderr=StringIO())
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.created, created)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.comments_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertFalse(os.path.exists(f'{self.path}.checkpoint'))
+
+    def test_invalid_rows_reported(self):
+        """Битые строки и неразрешённые ссылки пропускаются с ошибкой."""
+        with open(self.path, 'w') as file:
+            file.write('не json\n')
+            file.write(json.dumps({'type': 'post', 'id': 999,
+                                   'author': 'nobody', 'text': 'x'}) + '\n')
+            file.write(json.dumps({'type': 'group', 'slug': 'new',
+                                   'title': 'Новая',
+                                   'description': 'Есть'}) + '\n')
+        errors = StringIO()
+        call_command('import_ndjson', self.path, stdout=StringIO(),
+                     stderr=errors)
+        self.assertIn('строка 1', errors.getvalue())
+        self.assertIn("'nobody' не найден", errors.getvalue())
+        self.assertTrue(Group.objects.filter(slug='new').exists())
+        self.assertFalse(Post.objects.filter(pk=999).exists())
+
+    def test_import_resumes_from_checkpoint(self):
+        """Строки до контрольной точки не загружаются повторно."""
+        with open(self.path, 'w') as file:
+            for slug in ('first', 'second'):
+                file.write(json.dumps({
+                    'type': 'group', 'slug': slug, 'title': slug,
+                    'description': slug,
+                }) + '\n')
+        with open(f'{self.path}.checkpoint', 'w') as file:
+            json.dump({'line': 1}, file)
+        call_command('import_ndjson', self.path, resume=True,
+                     stdout=StringIO(), stderr=StringIO())
+        self.assertFalse(Group.objects.filter(slug='first').exists())
+        self.assertTrue(Group.objects.filter(slug='second').exists())
+
+    def test_export_resumes_from_checkpoint(self):
+        """Прерванная выгрузка дописывается без повторов."""
+        call_command('export_ndjson', self.path, types=['group', 'user'],
+                     chunk_size=1, stdout=StringIO())
+        with open(self.path) as file:
+            expected = file.read()
+        first_line = expected.split('\n')[0] + '\n'
+        with open(self.path, 'w') as file:
+            file.write(first_line + '{"type": "обрыв')
+        with open(f'{self.path}.checkpoint', 'w') as file:
+            json.dump({'type': 'group', 'last_pk': self.group.pk,
+                       'offset': len(first_line.encode())}, file)
+        call_command('export_ndjson', self.path, types=['group', 'user'],
+                     chunk_size=1, resume=True, stdout=StringIO())
+        with open(self.path) as file:
+            self.assertEqual(file.read(), expected)
+
+    def test_import_limits_in_lists(self):
+        """Списки IN режутся на пачки и не упираются в предел
+        параметров базы."""
+        with open(self.path, 'w') as file:
+            for number in range(5):
+                file.write(json.dumps({
+                    'type': 'user', 'username': f'NdFollower{number}',
+                }) + '\n')
+                file.write(json.dumps({
+                    'type': 'follow', 'user': f'NdFollower{number}',
+                    'author': 'NdAuthor',
+                }) + '\n')
+                file.write(json.dumps({
+                    'type': 'comment', 'id': 1000 + number,
+                    'post': self.post.pk, 'author': f'NdFollower{number}',
+                    'text': 'Ещё',
+                }) + '\n')
+        with open(self.path) as file:
+            lines = list(enumerate(file, 1))
+        with mock.patch.object(bulk, 'MAX_IN_SIZE', 2):
+            with CaptureQueriesContext(connection) as queries:
+                ndjson.Importer().load_chunk(lines)
+        for query in queries.captured_queries:
+            for values in re.findall(r' IN \(([^()]*)\)', query['sql']):
+                with self.subTest(sql=query['sql']):
+                    self.assertLessEqual(len(values.split(',')), 2)
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user__username__startswith='NdFollower').count(), 5)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 6)
@@ -0,0 +1,11 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class QueryPlansTest(TestCase):
+    def test_views_use_indexes(self):
+        """Запросы view-функций не сканируют таблицы целиком
+        и не сортируют во временном B-дереве."""
+        call_command('check_query_plans', stdout=StringIO())
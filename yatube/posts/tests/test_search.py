@@ -0,0 +1,88 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from posts import search
+from posts.models import Comment, Post
+from posts.views import POSTS_QUANTITY
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Searcher')
+        cls.title_post = Post.objects.create(
+            author=cls.user, text='Пишем про котиков')
+        cls.comment_post = Post.objects.create(
+            author=cls.user, text='Про собак')
+        Comment.objects.create(
+            post=cls.comment_post, author=cls.user, text='А котики лучше')
+        cls.other_post = Post.objects.create(
+            author=cls.user, text='Совсем другое')
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_posts_and_comments(self):
+        """Поиск находит посты по тексту и по комментариям."""
+        self.assertEqual(
+            set(self.search('котик')), {self.title_post, self.comment_post})
+        self.assertEqual(self.search('другое'), [self.other_post])
+
+    def test_search_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении постов."""
+        Post.objects.filter(pk=self.other_post.pk).update(text='Про котиков')
+        self.assertIn(self.other_post, self.search('котиков'))
+        Post.objects.filter(pk=self.other_post.pk).delete()
+        self.assertNotIn(self.other_post, self.search('котиков'))
+
+    def test_search_pages_with_cursor(self):
+        """Результаты поиска листаются курсором без повторов и без
+        ссылок на все страницы."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Котик номер {number}')
+            for number in range(POSTS_QUANTITY + 2)
+        )
+        found = Post.objects.filter(text__startswith='Котик')
+        call_command('rebuild_search_index', stdout=StringIO())
+        url = reverse('posts:search')
+        first = self.client.get(url, {'q': 'котик'}).context['page_obj']
+        self.assertEqual(first.paginator.count, len(found) + 2)
+        self.assertEqual(len(first), POSTS_QUANTITY)
+        second = self.client.get(
+            url, {'q': 'котик', 'after': first.next_cursor})
+        self.assertNotContains(second, 'page=')
+        second = second.context['page_obj']
+        self.assertFalse(second.has_next())
+        self.assertEqual(
+            {post.pk for post in [*first, *second]},
+            {post.pk for post in found} | {
+                self.title_post.pk, self.comment_post.pk})
+        back = self.client.get(
+            url, {'q': 'котик', 'before': second.previous_cursor})
+        self.assertEqual(list(back.context['page_obj']), list(first))
+
+    def test_search_query_syntax_ignored(self):
+        """Операторы FTS5 в запросе не приводят к ошибке."""
+        self.assertEqual(self.search('"котик OR (*'), [])
+        self.assertEqual(self.search(''), [])
+
+    def test_rebuild_search_index(self):
+        """Команда перестраивает индекс по существующим строкам."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+        self.assertEqual(self.search('котик'), [])
+        call_command('rebuild_search_index', batch_size=1, stdout=StringIO())
+        self.assertEqual(
+            set(self.search('котик')), {self.title_post, self.comment_post})
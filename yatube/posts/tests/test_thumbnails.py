@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from posts import thumbnails
+from posts.models import Post, ThumbnailJob
+
+User = get_user_model()
+
+
+class ThumbnailJobTests(TestCase):
+    def test_mark_done_fixed_queries(self):
+        """Отметка готовых превью не делает запросов на каждый пост."""
+        author = User.objects.create_user(username='ThumbAuthor')
+        posts = [
+            Post.objects.create(author=author, text=f'Thumb {i}')
+            for i in range(3)
+        ]
+        ThumbnailJob.objects.create(
+            post=posts[0], image='old.jpg', status=ThumbnailJob.FAILED,
+            attempts=3, error='boom')
+        post_images = [(post.id, f'{post.id}.jpg') for post in posts]
+        with self.assertNumQueries(3):
+            thumbnails.mark_done(post_images)
+        self.assertEqual(
+            set(ThumbnailJob.objects.values_list(
+                'post_id', 'image', 'status', 'attempts', 'error')),
+            {(post_id, image, ThumbnailJob.DONE, 0, '')
+             for post_id, image in post_images})
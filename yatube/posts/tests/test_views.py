@@ -1,14 +1,31 @@
+import asyncio
+import contextvars
+import copy
+import json
 import shutil
 import tempfile
+from unittest import mock
 
+from asgiref.sync import sync_to_async
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
-from django.urls import reverse
-from posts.models import Comment, Follow, Group, Post
+from django.db import connection, connections
+from django.test import (
+    AsyncClient, Client, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, resolve, reverse
+from core import cache_backends, executor
+from core.query_budget import QueryBudgetExceeded, query_budget
+from posts import cards, timeline
+from posts.management.commands import build_image_variants
+from posts.models import (
+    Comment, Follow, Group, Post, PostImageVariant, TimelineEntry,
+)
+from posts.views import COMMENTS_QUANTITY, POSTS_QUANTITY
 
 User = get_user_model()
 
@@ -80,6 +97,7 @@ class PostPagesTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.guests_client = Client()
 
         self.authorized_client = Client()
@@ -181,24 +199,41 @@ class PostPagesTests(TestCase):
                 self.assertIsInstance(form_field, expected)
 
     def test_index_page_cache(self):
-        """Проверка кеширования списка постов на главной странице."""
+        """Карточки постов берутся из кеша без повторного рендера."""
+        self.authorized_client.get(reverse('posts:index'))
+        self.assertIsNotNone(cache.get(cards.card_key(self.post, 'feed')))
+        Post.objects.filter(id=self.post.id).update(text='Stale marker')
         content = (self.authorized_client.
-                   get(reverse('posts:index')).content)
-        Post.objects.filter(id=self.post.id).delete()
-        cached_content = (self.authorized_client.
-                          get(reverse('posts:index')).content)
-        self.assertEqual(content, cached_content)
+                   get(reverse('posts:index')).content.decode())
+        self.assertNotIn('Stale marker', content)
 
-    def test_index_page_after_clear_cache(self):
-        """Проверка обновления списка постов на главной странице
-        после очистки кэша."""
-        Post.objects.filter(id=self.post.id).delete()
+    def test_index_page_after_post_edit(self):
+        """Изменённый пост сразу перерисовывается в ленте."""
+        self.authorized_client.get(reverse('posts:index'))
+        post = Post.objects.get(id=self.post.id)
+        post.text = 'Edited marker'
+        post.save()
         content = (self.authorized_client.
-                   get(reverse('posts:index')).content)
-        cache.clear()
-        content_after_clear_cache = (self.authorized_client.
-                                     get(reverse('posts:index')).content)
-        self.assertNotEqual(content, content_after_clear_cache)
+                   get(reverse('posts:index')).content.decode())
+        self.assertIn('Edited marker', content)
+
+    def test_index_page_after_post_delete(self):
+        """Удалённый пост сразу пропадает из ленты."""
+        self.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(id=self.post.id).delete()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotIn(self.post, response.context['page_obj'])
+        self.assertIsNone(cache.get(cards.card_key(self.post, 'feed')))
+
+    def test_card_cache_follows_group_change(self):
+        """Карточки перерисовываются после изменения группы."""
+        self.client.get(reverse('posts:index'))
+        self.gpoup.slug = 'renamed-slug'
+        self.gpoup.save()
+        content = self.client.get(reverse('posts:index')).content.decode()
+        self.assertIn('/group/renamed-slug/', content)
+        self.gpoup.slug = 'test-slug'
+        self.gpoup.save()
 
     def test_user_follow(self):
         """Авторизованный пользователь может подписываться
@@ -278,3 +313,716 @@ class PaginatorViewsTest(PostPagesTests):
                 self.assertEqual(page_count, expected,
                                  f'На странице {page} {expected} постов, '
                                  f'а не {page_count}')
+
+    def test_cursor_pages_cover_feed(self):
+        pages = {
+            reverse('posts:index'): 16,
+            reverse('posts:group_list', args=[self.gpoup.slug]): 15,
+            reverse('posts:profile', args=[self.user.username]): 15,
+        }
+        for page, posts_count in pages.items():
+            with self.subTest(page=page):
+                first_page = self.client.get(page).context['page_obj']
+                self.assertEqual(len(first_page), 10)
+                self.assertFalse(first_page.has_previous())
+                second_page = self.client.get(
+                    page, {'after': first_page.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second_page), posts_count - 10)
+                self.assertFalse(second_page.has_next())
+                self.assertFalse(
+                    set(first_page) & set(second_page),
+                    f'Страницы {page} пересекаются',
+                )
+                previous_page = self.client.get(
+                    page, {'before': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(previous_page), list(first_page))
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(
+            reverse('posts:index'), {'after': 'not-a-cursor'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        self.assertFalse(page_obj.has_previous())
+
+
+class FollowTimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.follower = User.objects.create_user(username='Follower')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Old post',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def follow_feed(self):
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_timeline(self):
+        """Подписка переносит посты автора в ленту подписчика."""
+        self.follower_client.get(
+            reverse('posts:profile_follow', args=[self.author.username]))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=self.old_post).exists())
+        self.assertEqual(self.follow_feed(), [self.old_post])
+
+    def test_backfill_single_query(self):
+        """Перенос постов в ленту не зависит от их числа по запросам."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Post {i}')
+            for i in range(timeline.BATCH_SIZE + 1)
+        )
+        # bulk_create не шлёт сигналов: перенос вызывается явно.
+        follow, = Follow.objects.bulk_create([
+            Follow(user=self.follower, author=self.author, fanout=True)])
+        with self.assertNumQueries(1):
+            timeline.backfill(follow)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.follower).count(),
+            timeline.BATCH_SIZE + 2)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_follow_prolific_author_within_budget(self):
+        """Подписка на автора с многими постами укладывается в бюджет."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Post {i}')
+            for i in range(3 * timeline.BATCH_SIZE)
+        )
+        response = self.follower_client.get(
+            reverse('posts:profile_follow', args=[self.author.username]))
+        self.assertRedirects(response, reverse(
+            'posts:profile', args=[self.author.username]))
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.follower).count(),
+            3 * timeline.BATCH_SIZE + 1)
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='New post')
+        self.assertEqual(self.follow_feed(), [new_post, self.old_post])
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка очищает ленту от постов автора."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.follower_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username]))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.follow_feed(), [])
+
+    def test_post_delete_prunes_timeline(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        Post.objects.filter(id=self.old_post.id).delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_read_on_request(self):
+        """Посты популярного автора читаются без раскладки по лентам."""
+        follow = Follow.objects.create(user=self.follower, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='New post')
+        self.assertFalse(follow.fanout)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.follow_feed(), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0, QUERY_BUDGET_STRICT=True)
+    def test_pull_authors_fixed_queries(self):
+        """Число запросов ленты не растёт с числом авторов без раскладки."""
+        posts = []
+        for number in range(8):
+            author = User.objects.create_user(username=f'Pull{number}')
+            Follow.objects.create(user=self.follower, author=author)
+            posts.append(Post.objects.create(author=author, text='Pull'))
+        url = reverse('posts:follow_index')
+        self.follower_client.get(url)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.follower_client.get(url)
+        few = len(captured)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(response.context['page_obj']), posts[::-1])
+        Follow.objects.filter(user=self.follower).exclude(
+            author__username='Pull0').delete()
+        with CaptureQueriesContext(connection) as captured:
+            self.follower_client.get(url)
+        self.assertEqual(len(captured), few)
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.posts = []
+        for number in range(POSTS_QUANTITY):
+            author = User.objects.create_user(
+                username=f'BudgetUser{number}', first_name='Имя')
+            group = Group.objects.create(
+                title=f'Группа {number}', slug=f'budget-{number}')
+            post = Post.objects.create(
+                author=author, group=group, text='Budget text')
+            Comment.objects.create(post=post, author=author, text='Budget')
+            cls.posts.append(post)
+        for post in cls.posts:
+            Comment.objects.create(
+                post=cls.posts[0], author=post.author, text='Budget')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_query_count_does_not_grow_with_page(self):
+        """Авторы и группы карточек читаются одним запросом с постами."""
+        with self.assertNumQueries(1):
+            self.client.get(reverse('posts:index'))
+
+    def test_comments_loaded_with_authors(self):
+        """Авторы комментариев читаются вместе с комментариями:
+        валидатор страницы, пост и комментарии."""
+        with self.assertNumQueries(3):
+            self.client.get(
+                reverse('posts:post_detail', args=[self.posts[0].id]))
+
+    def test_posts_views_declare_budget(self):
+        """Каждая view-функция posts объявляет бюджет запросов."""
+        resolver = get_resolver()
+        for pattern in resolver.url_patterns[0].url_patterns:
+            with self.subTest(view=pattern.name):
+                self.assertTrue(hasattr(pattern.callback, 'query_budget'))
+
+    def test_budget_exceeded(self):
+        """Превышение бюджета в строгом режиме — ошибка."""
+        @query_budget(1)
+        def view(request):
+            list(User.objects.all())
+            list(Group.objects.all())
+
+        with override_settings(QUERY_BUDGET_STRICT=True):
+            with self.assertRaises(QueryBudgetExceeded):
+                view(None)
+
+
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Commentator')
+        cls.post = Post.objects.create(author=cls.user, text='Comments')
+        for number in range(COMMENTS_QUANTITY + 3):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Comment {number}')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_first_page_rendered_on_detail(self):
+        """На странице поста только первая страница комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id]))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_QUANTITY)
+        self.assertEqual(comments[0].text, 'Comment 0')
+        self.assertContains(
+            response, reverse('posts:post_comments', args=[self.post.id]))
+
+    def test_next_page_endpoint(self):
+        """Следующая страница доступна фрагментом и в JSON."""
+        first = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        ).context['comments']
+        url = reverse('posts:post_comments', args=[self.post.id])
+        response = self.client.get(url, {'after': first.next_cursor})
+        self.assertEqual(len(response.context['comments']), 3)
+        self.assertNotContains(response, 'comments-more')
+        data = self.client.get(
+            url, {'after': first.next_cursor, 'format': 'json'}).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            [f'Comment {number}' for number in range(
+                COMMENTS_QUANTITY, COMMENTS_QUANTITY + 3)],
+        )
+        self.assertIsNone(data['next'])
+
+    def test_comments_count(self):
+        """Число комментариев поста хранится в самом посте."""
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, COMMENTS_QUANTITY + 3)
+        self.post.comments.first().delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, COMMENTS_QUANTITY + 2)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='EtagAuthor')
+        cls.reader = User.objects.create_user(username='EtagReader')
+        cls.group = Group.objects.create(title='Etag', slug='etag')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Etag text')
+
+    def setUp(self):
+        cache.clear()
+
+    def assertNotModified(self, url, client=None, **headers):
+        client = client or self.client
+        # Первый ответ выдаёт CSRF-cookie, от которой зависит ETag.
+        client.get(url)
+        etag = client.get(url)['ETag']
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag, **headers)
+        self.assertEqual(response.status_code, 304)
+        return etag
+
+    def test_not_modified_skips_queries(self):
+        """Повторный запрос ленты с тем же ETag не обращается к базе."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        url = reverse('posts:group_list', args=[self.group.slug])
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_update_validators(self):
+        """Изменения данных страницы меняют её ETag."""
+        client = Client()
+        client.force_login(self.reader)
+        cases = {
+            reverse('posts:index'): lambda: Post.objects.create(
+                author=self.reader, text='Новый пост'),
+            reverse('posts:group_list', args=[self.group.slug]):
+                lambda: Post.objects.filter(pk=self.post.pk).get().save(),
+            reverse('posts:profile', args=[self.author.username]):
+                lambda: Follow.objects.create(
+                    user=self.reader, author=self.author),
+            reverse('posts:post_detail', args=[self.post.id]):
+                lambda: Comment.objects.create(
+                    post=self.post, author=self.reader, text='Новый'),
+        }
+        for url, change in cases.items():
+            with self.subTest(url=url):
+                etag = self.assertNotModified(url, client)
+                change()
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """Страницы разных пользователей не делят ETag."""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        etag = self.client.get(url)['ETag']
+        client = Client()
+        client.force_login(self.reader)
+        self.assertNotEqual(client.get(url)['ETag'], etag)
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='PageAuthor')
+        cls.post = Post.objects.create(author=cls.author, text='Page text')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_page_served_from_cache(self):
+        """Повторный запрос анонима не рендерит ленту заново."""
+        url = reverse('posts:index')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertNotIn('page_obj', second.context)
+        self.assertEqual(second.content, first.content)
+
+    def test_changes_invalidate_cached_pages(self):
+        """Сигналы об изменениях уводят на новую запись кеша."""
+        detail = reverse('posts:post_detail', args=[self.post.id])
+        self.client.get(detail)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Свежий комментарий')
+        self.assertContains(self.client.get(detail), 'Свежий комментарий')
+        self.client.get(reverse('posts:index'))
+        Post.objects.create(author=self.author, text='Свежий пост')
+        self.assertContains(
+            self.client.get(reverse('posts:index')), 'Свежий пост')
+
+    def test_stale_page_served_while_rendering(self):
+        """Пока новую версию рендерит другой воркер, отдаётся старая."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(author=self.author, text='Свежий пост')
+        with mock.patch('posts.middleware.stampede.acquire',
+                        return_value=False):
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+        self.assertNotContains(response, 'Свежий пост')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_image_variants_invalidate_cached_pages(self):
+        """Новые варианты картинок перерисовывают страницы с постом."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        updated = self.post.updated
+        build_image_variants.Command().finish([(self.post.id, 'image.jpg')])
+        self.assertIn('page_obj', self.client.get(url).context)
+        self.post.refresh_from_db()
+        self.assertNotEqual(self.post.updated, updated)
+
+    def test_holes_rendered_for_each_user(self):
+        """Общая страница из кеша дополняется фрагментами пользователя."""
+        reader = User.objects.create_user(username='PageReader')
+        Follow.objects.create(user=reader, author=self.author)
+        detail = reverse('posts:post_detail', args=[self.post.id])
+        profile = reverse('posts:profile', args=[self.author.username])
+        for url in (detail, profile):
+            self.client.get(url)
+        author_client = Client()
+        author_client.force_login(self.author)
+        reader_client = Client()
+        reader_client.force_login(reader)
+
+        response = author_client.get(detail)
+        self.assertNotIn('post', response.context)
+        self.assertContains(response, 'Пользователь: PageAuthor')
+        self.assertContains(response, 'Редактировать запись')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        response = reader_client.get(detail)
+        self.assertNotContains(response, 'Редактировать запись')
+        self.assertContains(response, 'Добавить комментарий')
+        self.assertNotContains(self.client.get(detail), 'Добавить комментарий')
+
+        self.assertNotContains(author_client.get(profile), 'Подписаться')
+        self.assertContains(reader_client.get(profile), 'Отписаться')
+        self.assertNotContains(self.client.get(profile), '<!--hole')
+
+
+class ProfileExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Exporter')
+        cls.group = Group.objects.create(
+            title='Выгрузка', slug='export', description='Группа')
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'Пост {number}')
+            for number in range(3)
+        ]
+        cls.comment = Comment.objects.create(
+            post=cls.posts[0], author=cls.author, text='Свой, комментарий')
+        cls.url = reverse('posts:profile_export', args=[cls.author])
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def lines(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_ndjson_export(self):
+        """Посты, затем комментарии автора, по строке JSON на запись."""
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        records = [json.loads(line) for line in self.lines(response)]
+        self.assertEqual(
+            [(record['type'], record['id']) for record in records],
+            [('post', post.pk) for post in self.posts]
+            + [('comment', self.comment.pk)])
+        self.assertEqual(records[0]['group'], 'export')
+        self.assertEqual(records[-1]['post'], self.posts[0].pk)
+
+    def test_csv_export(self):
+        """CSV начинается с заголовка и экранирует запятые."""
+        response = self.client.get(self.url, {'format': 'csv'})
+        lines = self.lines(response)
+        self.assertEqual(lines[0].split(',')[:3], ['cursor', 'type', 'id'])
+        self.assertEqual(len(lines), 5)
+        self.assertIn('"Свой, комментарий"', lines[-1])
+
+    def test_resume_after_cursor(self):
+        """?after продолжает выгрузку со следующей записи."""
+        cursor = json.loads(self.lines(self.client.get(self.url))[1])[
+            'cursor']
+        records = [
+            json.loads(line) for line in
+            self.lines(self.client.get(self.url, {'after': cursor}))
+        ]
+        self.assertEqual(
+            [record['id'] for record in records],
+            [self.posts[2].pk, self.comment.pk])
+
+    def test_invalid_parameters(self):
+        for params in ({'after': 'post:x'}, {'format': 'xml'}):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+
+    def test_only_author(self):
+        """Чужую выгрузку не отдаём: редирект на профиль."""
+        other = User.objects.create_user(username='Stranger')
+        self.client.force_login(other)
+        response = self.client.get(self.url)
+        self.assertRedirects(
+            response, reverse('posts:profile', args=[self.author]))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='ApiAuthor', first_name='Анна', last_name='Иванова')
+        cls.reader = User.objects.create_user(username='ApiReader')
+        cls.group = Group.objects.create(
+            title='Api', slug='api', description='Группа')
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'Пост {number}')
+            for number in range(POSTS_QUANTITY + 2)
+        ]
+        cls.post = cls.posts[-1]
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get(self, name, *args, client=None, **params):
+        response = (client or self.client).get(
+            reverse(f'posts:{name}', args=args), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_index_pages_with_cursor(self):
+        """Страницы ленты идут по курсору next без повторов."""
+        first = self.get('api_index')
+        self.assertEqual(len(first['results']), POSTS_QUANTITY)
+        self.assertIsNone(first['previous'])
+        second = self.get('api_index', after=first['next'])
+        self.assertIsNone(second['next'])
+        ids = [post['id'] for post in first['results'] + second['results']]
+        self.assertEqual(ids, [post.id for post in reversed(self.posts)])
+
+    def test_post_fields_and_counters(self):
+        post = self.get('api_index')['results'][0]
+        self.assertEqual(post['author'], {
+            'username': 'ApiAuthor', 'full_name': 'Анна Иванова'})
+        self.assertEqual(post['group'], 'api')
+        self.assertEqual(post['comments_count'], 1)
+        self.assertIsNone(post['image'])
+
+    def test_image_urls(self):
+        """Картинка, превью и готовые варианты поста."""
+        self.post.image = 'posts/api.jpg'
+        Post.objects.filter(pk=self.post.pk).update(image=self.post.image)
+        PostImageVariant.objects.create(
+            post=self.post, source='posts/api.jpg', format='webp',
+            width=320, height=113, file='posts/variants/api-320.webp')
+        preview = mock.Mock(url='/media/cache/api.jpg')
+        with mock.patch('posts.api.thumbnails.lookup_many',
+                        return_value={'posts/api.jpg': preview}):
+            post = self.get('api_post_detail', self.post.id)['post']
+        self.assertEqual(post['image'], '/media/posts/api.jpg')
+        self.assertEqual(post['thumbnail'], '/media/cache/api.jpg')
+        self.assertEqual(post['variants'], [{
+            'format': 'webp', 'width': 320,
+            'url': '/media/posts/variants/api-320.webp'}])
+
+    def test_group_and_profile(self):
+        group = self.get('api_group_list', self.group.slug)
+        self.assertEqual(group['group']['title'], 'Api')
+        self.assertEqual(len(group['results']), POSTS_QUANTITY)
+        author = self.get('api_profile', self.author.username)['author']
+        self.assertEqual(author['posts_count'], len(self.posts))
+        self.assertEqual(author['followers_count'], 0)
+
+    def test_post_detail_comments(self):
+        data = self.get('api_post_detail', self.post.id)
+        self.assertEqual(data['post']['comments_count'], 1)
+        self.assertEqual(data['comments'][0]['author'], 'ApiReader')
+        self.assertIsNone(data['comments_next'])
+
+    def test_not_found_json(self):
+        """Несуществующий объект — 404 с телом JSON, а не HTML."""
+        for name, arg in (('api_post_detail', 0),
+                          ('api_group_list', 'missing'),
+                          ('api_profile', 'missing')):
+            with self.subTest(name=name):
+                response = self.client.get(
+                    reverse(f'posts:{name}', args=[arg]))
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('detail', response.json())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_follow_index(self):
+        """Лента подписок собирает и разложенных, и читаемых авторов."""
+        other = User.objects.create_user(username='ApiOther')
+        Follow.objects.create(user=other, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=other)
+        other_post = Post.objects.create(author=other, text='Другой')
+        data = self.get('api_follow_index', client=self.reader_client)
+        self.assertEqual(data['results'][0]['id'], other_post.id)
+        rest = self.get('api_follow_index', client=self.reader_client,
+                        after=data['next'])
+        self.assertEqual(
+            len(data['results']) + len(rest['results']), len(self.posts) + 1)
+        response = self.client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('detail', response.json())
+
+    def test_etag(self):
+        """Опрос с тем же ETag отдаёт 304: комментарий не меняет ETag
+        ленты, а новый пост меняет."""
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Ещё')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.author, text='Новый')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(ROOT_URLCONF='yatube.asgi_urls')
+class AsyncViewsTests(TransactionTestCase):
+    """Асинхронные ленты ходят в базу из потоков core.executor, поэтому
+    данные должны быть закоммичены."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='AsyncAuthor')
+        self.group = Group.objects.create(title='Async', slug='async')
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Асинхронный пост')
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий')
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+        ]
+
+    def test_async_views_routed(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                view = resolve(url).func
+                self.assertTrue(asyncio.iscoroutinefunction(view))
+                self.assertTrue(hasattr(view, 'query_budget'))
+                self.assertTrue(hasattr(view, 'page_scopes'))
+
+    async def test_same_pages_as_sync(self):
+        """Асинхронные ленты отдают те же страницы, что и синхронные."""
+        client = AsyncClient()
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = await client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Асинхронный пост')
+                self.assertIn('Server-Timing', response)
+                with override_settings(ROOT_URLCONF='yatube.urls'):
+                    expected = await sync_to_async(self.client.get)(url)
+                self.assertEqual(response.content, expected.content)
+
+    async def test_missing_object(self):
+        response = await AsyncClient().get(
+            reverse('posts:group_list', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_not_modified(self):
+        client = AsyncClient()
+        url = self.urls[3]
+        # Первый ответ выдаёт CSRF-cookie, от которой зависит ETag.
+        await client.get(url)
+        etag = (await client.get(url))['ETag']
+        # AsyncClient принимает заголовки по их именам в HTTP.
+        response = await client.get(url, **{'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_follow_index(self):
+        """Лента подписок: редирект анонима и те же посты, что в WSGI."""
+        url = reverse('posts:follow_index')
+        view = resolve(url).func
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        self.assertTrue(hasattr(view, 'query_budget'))
+        response = await AsyncClient().get(url)
+        self.assertEqual(response.status_code, 302)
+        reader = await sync_to_async(User.objects.create_user)('AsyncReader')
+        await sync_to_async(Follow.objects.create)(
+            user=reader, author=self.author)
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(reader)
+        response = await client.get(url)
+        self.assertEqual(
+            list(response.context['page_obj']), [self.post])
+        self.assertContains(response, 'Асинхронный пост')
+
+    async def test_cache_connection_reused(self):
+        """Запросы ASGI не открывают файл L2 кеша заново."""
+        url = self.urls[0]
+        client = AsyncClient()
+        caches = copy.deepcopy(settings.CACHES)
+        # Каждое чтение сверяется с журналом L2, а не только с L1.
+        caches['default']['OPTIONS']['SYNC_INTERVAL'] = 0
+        with self.settings(CACHES=caches):
+            await client.get(url)
+            with mock.patch.object(
+                cache_backends.sqlite3, 'connect',
+                wraps=cache_backends.sqlite3.connect,
+            ) as connect:
+                for _ in range(5):
+                    # Сервер ASGI выполняет каждый запрос в задаче с
+                    # чистым контекстом, где у Django нет экземпляров
+                    # кешей: они создаются заново на каждый запрос.
+                    response = await asyncio.create_task(
+                        client.get(url), context=contextvars.Context())
+                    self.assertEqual(response.status_code, 200)
+        connect.assert_not_called()
+
+    async def test_executor_keeps_connections(self):
+        """Поток пула не закрывает соединение с базой после вызова."""
+        with mock.patch.object(
+            type(connections['default']), 'close', autospec=True,
+        ) as close:
+            for _ in range(3):
+                await executor.run(list, User.objects.all())
+        close.assert_not_called()
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    async def test_budget_counts_executor_queries(self):
+        """Запросы в потоках пула входят в бюджет асинхронной view."""
+        @query_budget(1)
+        async def view(request):
+            await asyncio.gather(
+                executor.run(list, User.objects.all()),
+                executor.run(list, Group.objects.all()),
+            )
+
+        with self.assertRaises(QueryBudgetExceeded):
+            await view(None)
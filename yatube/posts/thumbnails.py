@@ -0,0 +1,214 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from . import cards, variants, versions
+from .models import ThumbnailJob
+
+logger = logging.getLogger(__name__)
+
+CARD_GEOMETRY = '960x339'
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+MAX_ATTEMPTS = 3
+STALE_AFTER = timedelta(minutes=10)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _thumbnail_file(source, geometry, options):
+    """Повторяет вычисление имени превью из ThumbnailBackend.get_thumbnail,
+    не открывая исходную картинку."""
+    options = dict(options)
+    backend = default.backend
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def lookup(image, geometry=CARD_GEOMETRY, options=CARD_OPTIONS):
+    """Готовое превью из key-value хранилища sorl или None.
+
+    В отличие от тега {% thumbnail %} никогда не генерирует превью
+    в процессе запроса.
+    """
+    if not image:
+        return None
+    source = ImageFile(image)
+    return default.kvstore.get(
+        _thumbnail_file(source, geometry, options))
+
+
+def lookup_many(images, geometry=CARD_GEOMETRY, options=CARD_OPTIONS):
+    """Готовые превью для набора картинок: {имя картинки: превью или None}.
+
+    Для хранилища cached_db все ключи читаются одним get_many из кеша,
+    а промахи — одним запросом к таблице sorl.
+    """
+    images = {image.name if hasattr(image, 'name') else image
+              for image in images if image}
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return {image: lookup(image, geometry, options) for image in images}
+    raw_keys = {
+        add_prefix(_thumbnail_file(ImageFile(image), geometry, options).key):
+        image
+        for image in images
+    }
+    empty = cached_db_kvstore.EMPTY_VALUE
+    values = kvstore.cache.get_many(raw_keys)
+    missing = [key for key in raw_keys if key not in values]
+    if missing:
+        stored = dict(
+            KVStore.objects.filter(key__in=missing).values_list('key', 'value')
+        )
+        fetched = {key: stored.get(key, empty) for key in missing}
+        kvstore.cache.set_many(
+            fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    return {
+        image: (
+            None if values[key] == empty
+            else deserialize_image_file(values[key])
+        )
+        for key, image in raw_keys.items()
+    }
+
+
+def generate(post_id, image):
+    """Генерирует JPEG-превью sorl и WebP-варианты картинки поста."""
+    get_thumbnail(image, CARD_GEOMETRY, **CARD_OPTIONS)
+    variants.build(post_id, image)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def enqueue(post):
+    """Ставит картинку поста в очередь, если превью для неё ещё нет."""
+    if not post.image:
+        return
+    job, created = ThumbnailJob.objects.get_or_create(
+        post=post, defaults={'image': post.image.name}
+    )
+    if not created:
+        if job.image == post.image.name and job.status != job.FAILED:
+            return
+        ThumbnailJob.objects.filter(pk=job.pk).update(
+            image=post.image.name, status=job.PENDING, attempts=0, error='',
+            updated=timezone.now(),
+        )
+    transaction.on_commit(lambda: submit(job.pk))
+
+
+def submit(job_id):
+    """Передаёт задание пулу потоков; без пула выполняет его сразу."""
+    if settings.THUMBNAIL_WORKERS:
+        _get_executor().submit(run_job, job_id)
+    else:
+        process_job(job_id)
+
+
+def run_job(job_id):
+    """Выполняет задание в отдельном потоке со своим соединением с БД."""
+    close_old_connections()
+    try:
+        return process_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def process_job(job_id):
+    """Выполняет задание, если его ещё не забрал другой обработчик."""
+    claimed = ThumbnailJob.objects.filter(
+        pk=job_id, status=ThumbnailJob.PENDING
+    ).update(status=ThumbnailJob.RUNNING, updated=timezone.now())
+    if not claimed:
+        return False
+    job = ThumbnailJob.objects.get(pk=job_id)
+    try:
+        generate(job.post_id, job.image)
+    except Exception as error:
+        logger.exception('Не удалось создать превью %s', job.image)
+        attempts = job.attempts + 1
+        ThumbnailJob.objects.filter(pk=job_id).update(
+            status=(ThumbnailJob.FAILED if attempts >= MAX_ATTEMPTS
+                    else ThumbnailJob.PENDING),
+            attempts=attempts,
+            error=str(error),
+            updated=timezone.now(),
+        )
+        return False
+    ThumbnailJob.objects.filter(pk=job_id).update(
+        status=ThumbnailJob.DONE, error='', updated=timezone.now())
+    cards.touch_posts(pk=job.post_id)
+    versions.bump_post(job.post_id)
+    return True
+
+
+def pending_jobs():
+    """Задания в очереди, включая зависшие после падения процесса."""
+    ThumbnailJob.objects.filter(
+        status=ThumbnailJob.RUNNING,
+        updated__lt=timezone.now() - STALE_AFTER,
+    ).update(status=ThumbnailJob.PENDING, updated=timezone.now())
+    return ThumbnailJob.objects.filter(
+        status=ThumbnailJob.PENDING
+    ).values_list('pk', flat=True)
+
+
+def mark_done(post_images):
+    """Отмечает превью постов готовыми после пакетной генерации."""
+    ThumbnailJob.objects.bulk_create(
+        [
+            ThumbnailJob(post_id=post_id, image=image,
+                         status=ThumbnailJob.DONE)
+            for post_id, image in post_images
+        ],
+        ignore_conflicts=True,
+    )
+    images = dict(post_images)
+    ThumbnailJob.objects.filter(post_id__in=images).update(
+        image=Case(*(
+            When(post_id=post_id, then=Value(image))
+            for post_id, image in images.items()
+        )),
+        status=ThumbnailJob.DONE, attempts=0, error='',
+        updated=timezone.now(),
+    )
+    images_changed([post_id for post_id, _ in post_images])
+
+
+def images_changed(post_ids):
+    """Перерисовывает карточки постов с новыми превью или вариантами
+    и сбрасывает закешированные страницы, в которых они выведены."""
+    cards.touch_posts(pk__in=post_ids)
+    versions.bump(versions.SITE)
@@ -0,0 +1,186 @@
+from functools import reduce
+from itertools import islice
+from operator import or_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from . import cards
+from .bulk import in_chunks
+from .models import Follow, Post, TimelineEntry
+from .paginator import CursorPaginator
+
+BATCH_SIZE = 500
+
+
+def _bulk_insert(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            break
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def use_fanout(author):
+    """Раскладывать ли посты автора в ленту нового подписчика.
+
+    Материализованных подписчиков у автора не больше
+    TIMELINE_FANOUT_LIMIT, остальные читают его посты при открытии
+    ленты, поэтому публикация поста не порождает миллион вставок.
+    """
+    fanout_followers = Follow.objects.filter(author=author, fanout=True)
+    return fanout_followers.count() < settings.TIMELINE_FANOUT_LIMIT
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в ленты материализованных подписчиков."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id, fanout=True
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.id,
+            author_id=post.author_id,
+            created=post.created,
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def fan_out_posts(posts):
+    """Добавляет пачку постов, загруженных в обход сигналов, в ленты
+    материализованных подписчиков их авторов."""
+    by_author = {}
+    for post in posts:
+        by_author.setdefault(post.author_id, []).append(post)
+    for author_ids in in_chunks(by_author):
+        followers = Follow.objects.filter(
+            author_id__in=author_ids, fanout=True
+        ).values_list('author_id', 'user_id')
+        _bulk_insert(
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.id,
+                author_id=author_id,
+                created=post.created,
+            )
+            for author_id, user_id in followers.iterator()
+            for post in by_author[author_id]
+        )
+
+
+def _backfill(users, authors):
+    """INSERT ... SELECT постов авторов в ленты подписчиков с раскладкой:
+    один запрос, сколько бы постов ни было у авторов."""
+    ops = connection.ops
+    sql = (
+        f'{ops.insert_statement(ignore_conflicts=True)} '
+        f'{TimelineEntry._meta.db_table} (user_id, post_id, author_id, '
+        f'created) '
+        f'SELECT f.user_id, p.id, p.author_id, p.created '
+        f'FROM {Follow._meta.db_table} f '
+        f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+        f'WHERE f.fanout '
+        f'AND f.user_id IN ({", ".join(["%s"] * len(users))}) '
+        f'AND f.author_id IN ({", ".join(["%s"] * len(authors))})'
+        f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*users, *authors])
+
+
+def backfill(follow):
+    """Заполняет ленту подписчика постами автора."""
+    if follow.fanout:
+        _backfill([follow.user_id], [follow.author_id])
+
+
+def backfill_many(follows):
+    """Заполняет ленты для пачки подписок, созданных bulk_create,
+    INSERT ... SELECT на пачку подписок вместо запросов на каждую."""
+    follows = [follow for follow in follows if follow.fanout]
+    for batch in in_chunks(follows, lists=2):
+        _backfill(
+            {follow.user_id for follow in batch},
+            {follow.author_id for follow in batch},
+        )
+
+
+def prune(follow):
+    """Убирает посты автора из ленты бывшего подписчика."""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, author_id=follow.author_id
+    ).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок: материализованная часть плюс чтение постов авторов,
+    подписка на которых не раскладывается при публикации."""
+
+    def __init__(self, user, per_page):
+        super().__init__(Post.objects.all(), per_page)
+        self.user = user
+
+    def entries(self):
+        return cards.for_cards(
+            TimelineEntry.objects.filter(user=self.user),
+            prefix='post__', fields=('created',),
+        )
+
+    def unwrap(self, entry):
+        return entry.post
+
+    def pull_posts(self, condition):
+        return cards.for_cards(Post.objects.filter(condition))
+
+    def sort_key(self, post):
+        return post.created, post.id
+
+    def fetch(self, values=None, backwards=False, limit=None):
+        entries = CursorPaginator(
+            self.entries(), self.per_page, ordering=('-created', '-post_id'),
+        ).fetch(values, backwards, limit)
+        posts = [self.unwrap(entry) for entry in entries]
+        pull_authors = Follow.objects.filter(
+            user=self.user, fanout=False
+        ).values_list('author_id', flat=True)
+        # Посты всех авторов без раскладки читаются одним запросом: по
+        # подзапросу с LIMIT на автора, каждый идёт по индексу (author,
+        # created), а слияние с материализованной частью — ниже, в Python.
+        windows = [
+            Q(pk__in=CursorPaginator(
+                Post.objects.filter(author_id=author_id).values('pk'),
+                self.per_page,
+            ).window(values, backwards, limit))
+            for author_id in pull_authors
+        ]
+        if windows:
+            posts += self.pull_posts(reduce(or_, windows)).order_by()
+        posts.sort(key=self.sort_key, reverse=True)
+        if limit is None:
+            return posts
+        return posts[-limit:] if backwards else posts[:limit]
+
+
+class TimelineValuesPaginator(TimelinePaginator):
+    """Лента подписок строками values() с колонками поста fields."""
+
+    def __init__(self, user, per_page, fields):
+        super().__init__(user, per_page)
+        self.post_fields = fields
+
+    def entries(self):
+        return TimelineEntry.objects.filter(user=self.user).values(
+            *(f'post__{field}' for field in self.post_fields))
+
+    def unwrap(self, entry):
+        return {field: entry[f'post__{field}'] for field in self.post_fields}
+
+    def pull_posts(self, condition):
+        return Post.objects.filter(condition).values(*self.post_fields)
+
+    def sort_key(self, post):
+        return post['created'], post['id']
@@ -0,0 +1,95 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import PostImageVariant
+
+WIDTHS = (320, 640, 960)
+ASPECT = (960, 339)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+VARIANTS_DIR = 'posts/variants'
+
+
+def variant_size(width):
+    return width, round(width * ASPECT[1] / ASPECT[0])
+
+
+def variant_name(post_id, image, fmt, width):
+    stem = os.path.splitext(os.path.basename(image))[0]
+    return f'{VARIANTS_DIR}/{post_id}/{stem}-{width}.{fmt}'
+
+
+def missing(post_id, image):
+    """Варианты (формат, ширина), которых нет или которые построены
+    по другой исходной картинке."""
+    ready = {
+        (variant.format, variant.width)
+        for variant in PostImageVariant.objects.filter(
+            post_id=post_id, source=image
+        )
+        if default_storage.exists(variant.file.name)
+    }
+    return [
+        (fmt, width)
+        for fmt in FORMATS for width in WIDTHS
+        if (fmt, width) not in ready
+    ]
+
+
+def _encode(source, fmt, width):
+    pil_format, options = FORMATS[fmt]
+    mode = 'RGBA' if 'A' in source.getbands() else 'RGB'
+    image = ImageOps.fit(
+        source.convert(mode), variant_size(width), Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def build(post_id, image, force=False):
+    """Строит недостающие варианты картинки поста.
+
+    Возвращает число созданных файлов.
+    """
+    todo = (
+        [(fmt, width) for fmt in FORMATS for width in WIDTHS]
+        if force else missing(post_id, image)
+    )
+    if not todo:
+        return 0
+    with default_storage.open(image) as file:
+        source = ImageOps.exif_transpose(Image.open(file))
+        source.load()
+    for fmt, width in todo:
+        name = variant_name(post_id, image, fmt, width)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        name = default_storage.save(name, _encode(source, fmt, width))
+        _, height = variant_size(width)
+        PostImageVariant.objects.update_or_create(
+            post_id=post_id, format=fmt, width=width,
+            defaults={'source': image, 'height': height, 'file': name},
+        )
+    return len(todo)
+
+
+def srcset(post, fmt='webp'):
+    """Значение srcset из вариантов, соответствующих текущей картинке.
+
+    Варианты стоит загрузить заранее через prefetch_related.
+    """
+    ready = sorted(
+        (
+            variant for variant in post.image_variants.all()
+            if variant.format == fmt and variant.source == post.image.name
+        ),
+        key=lambda variant: variant.width,
+    )
+    return ', '.join(
+        f'{variant.file.url} {variant.width}w' for variant in ready
+    )
@@ -0,0 +1,165 @@
+import asyncio
+import functools
+import hashlib
+import time
+from calendar import timegm
+from datetime import datetime, timezone
+
+from core import executor
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+from .models import Post
+
+KEY_PREFIX = 'version'
+TIMEOUT = None
+SITE = 'site'
+FEED = 'feed'
+
+
+def group(group_id):
+    return f'group:{group_id}'
+
+
+def author(user_id):
+    return f'author:{user_id}'
+
+
+def post(post_id):
+    return f'post:{post_id}'
+
+
+def post_scopes(author_id, group_id, post_id):
+    """Области, которые меняет правка поста."""
+    scopes = [FEED, author(author_id), post(post_id)]
+    if group_id:
+        scopes.append(group(group_id))
+    return scopes
+
+
+def _key(scope):
+    return f'{KEY_PREFIX}:{scope}'
+
+
+def _set(scopes):
+    cache.set_many({_key(scope): time.time() for scope in scopes}, TIMEOUT)
+
+
+def bump(*scopes):
+    """Сдвигает штампы версий областей.
+
+    Внутри транзакции штампы сдвигаются ещё раз после коммита, чтобы
+    страница, отрендеренная до коммита, не получила новый ETag.
+    """
+    _set(scopes)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _set(scopes))
+
+
+def bump_post(post_id):
+    """Сдвигает штампы поста по сохранённым в базе автору и группе."""
+    stored = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id', 'pk').first()
+    if stored:
+        bump(*post_scopes(*stored))
+
+
+def stamps(scopes):
+    """Штампы версий областей: время последнего изменения.
+
+    Потерянный в кеше штамп считается изменением «сейчас».
+    """
+    keys = {_key(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in found}
+    for key, value in missing.items():
+        cache.add(key, value, TIMEOUT)
+    found.update(missing)
+    return {keys[key]: value for key, value in found.items()}
+
+
+def page_stamps(request, scopes_func, args, kwargs):
+    """Штампы областей страницы, посчитанные один раз за запрос,
+    или None, если scopes_func не смогла их определить."""
+    if not hasattr(request, 'page_stamps'):
+        scopes = scopes_func(request, *args, **kwargs)
+        request.page_stamps = (
+            None if scopes is None else stamps([SITE, *scopes]))
+    return request.page_stamps
+
+
+def validators(request, scopes_func, args, kwargs):
+    """(ETag, Last-Modified) страницы для текущего запроса."""
+    current = page_stamps(request, scopes_func, args, kwargs)
+    if current is None:
+        return None, None
+    state = repr((
+        sorted(current.items()),
+        request.user.pk,
+        request.META.get('CSRF_COOKIE'),
+        request.get_full_path(),
+    ))
+    return (
+        hashlib.md5(state.encode()).hexdigest(),
+        datetime.fromtimestamp(max(current.values()), timezone.utc),
+    )
+
+
+def conditional(scopes_func):
+    """Условный GET для ответа, зависящего от областей scopes_func.
+
+    scopes_func(request, *args, **kwargs) возвращает области ответа
+    или None, если валидатор посчитать нельзя (например, объекта нет).
+    ETag учитывает также пользователя, CSRF-токен и адрес с параметрами.
+    """
+    decorator = condition(
+        etag_func=lambda request, *args, **kwargs: validators(
+            request, scopes_func, args, kwargs)[0],
+        last_modified_func=lambda request, *args, **kwargs: validators(
+            request, scopes_func, args, kwargs)[1],
+    )
+
+    def wrapper(view):
+        if asyncio.iscoroutinefunction(view):
+            return _async_condition(view, scopes_func)
+        return decorator(view)
+    return wrapper
+
+
+def _async_condition(view, scopes_func):
+    """То же, что condition(), для асинхронной view: валидаторы читают
+    кеш и сессию, поэтому считаются в пуле core.executor."""
+    @functools.wraps(view)
+    async def inner(request, *args, **kwargs):
+        etag, last_modified = await executor.run(
+            validators, request, scopes_func, args, kwargs)
+        etag = quote_etag(etag) if etag else None
+        last_modified = (
+            timegm(last_modified.utctimetuple()) if last_modified else None)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await view(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            if last_modified and not response.has_header('Last-Modified'):
+                response['Last-Modified'] = http_date(last_modified)
+            if etag:
+                response.headers.setdefault('ETag', etag)
+        return response
+    return inner
+
+
+def conditional_page(scopes_func):
+    """conditional() для HTML-страницы, которую к тому же кеширует
+    PageCacheMiddleware: функция областей доступна как view.page_scopes.
+    """
+    decorator = conditional(scopes_func)
+
+    def wrapper(view):
+        view = decorator(view)
+        view.page_scopes = scopes_func
+        return view
+    return wrapper
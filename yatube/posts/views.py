@@ -1,24 +1,70 @@
+from urllib.parse import urlencode
+
+from core.query_budget import query_budget
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import (HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
 
+from . import cards, export, search, stats, versions
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .models import Comment, Follow, Group, Post
+from .paginator import CursorPaginator
+from .timeline import TimelinePaginator
 
 POSTS_QUANTITY = 10
+COMMENTS_QUANTITY = 20
 User = get_user_model()
 
 
-def include_paginator(request, db_object):
-    paginator = Paginator(db_object, POSTS_QUANTITY)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+def feed_scopes(request):
+    return [versions.FEED]
+
+
+def group_scopes(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    return None if group_id is None else [versions.group(group_id)]
+
+
+def profile_scopes(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    return None if author_id is None else [versions.author(author_id)]
+
+
+def post_scopes(request, post_id):
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True).first()
+    if author_id is None:
+        return None
+    return [versions.post(post_id), versions.author(author_id)]
+
+
+def include_paginator(request, db_object, cursor_paginator=None):
+    """Keyset-пагинация по ?after=/?before=.
+
+    Старые ссылки вида ?page=N обслуживаются обычным Paginator.
+    """
+    if 'page' in request.GET:
+        paginator = Paginator(db_object, POSTS_QUANTITY)
+        page = paginator.get_page(request.GET.get('page'))
+        # Ссылки только на соседние страницы, а не на все сразу.
+        page.page_range = paginator.get_elided_page_range(page.number)
+        return page
+    paginator = cursor_paginator or CursorPaginator(db_object, POSTS_QUANTITY)
+    return paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
 
 
+@query_budget(6)
+@versions.conditional_page(feed_scopes)
 def index(request):
-    post_list = Post.objects.all()
+    post_list = cards.for_cards(Post.objects.all())
     page_obj = include_paginator(request, post_list)
     context = {
         'page_obj': page_obj,
@@ -27,9 +73,11 @@ def index(request):
     return render(request, template, context)
 
 
+@query_budget(8)
+@versions.conditional_page(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.groups.all()
+    post_list = cards.for_cards(group.groups.all())
     page_obj = include_paginator(request, post_list)
     context = {
         'group': group,
@@ -39,33 +87,42 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@query_budget(9)
+@versions.conditional_page(profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    count_posts = author.posts.all().count()
-    post_list = author.posts.all()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    author_stats = stats.for_user(author)
+    post_list = cards.for_cards(author.posts.all())
     page_obj = include_paginator(request, post_list)
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user, author=author).exists()
     context = {
         'author_username': author,
-        'count_posts': count_posts,
+        'count_posts': author_stats.posts_count,
+        'author_stats': author_stats,
         'page_obj': page_obj,
-        'following': following,
     }
     template = 'posts/profile.html'
     return render(request, template, context)
 
 
+def comments_paginator(post_id):
+    """Комментарии поста от старых к новым по индексу (post, created, id)."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author').only('text', 'created', 'post_id', 'author__username')
+    return CursorPaginator(
+        comments, COMMENTS_QUANTITY, ordering=('created', 'id'))
+
+
+@query_budget(7)
+@versions.conditional_page(post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id)
     author = post.author
-    comments = post.comments.all()
-    count_posts = author.posts.all().count()
-    form = CommentForm(request.POST or None)
+    comments = comments_paginator(post.id).get_page()
     context = {
-        'count_posts': count_posts,
+        'count_posts': stats.for_user(author).posts_count,
         'post': post,
-        'form': form,
         'comments': comments
 
     }
@@ -73,7 +130,54 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+@query_budget(2)
+def post_comments(request, post_id):
+    """Следующая страница комментариев: HTML-фрагмент или JSON
+    при ?format=json."""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    comments = comments_paginator(post.id).get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created,
+                }
+                for comment in comments
+            ],
+            'next': comments.next_cursor,
+        })
+    context = {
+        'post': post,
+        'comments': comments,
+    }
+    template = 'posts/includes/comments.html'
+    return render(request, template, context)
+
+
+@query_budget(7)
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = search.SearchPaginator(query, POSTS_QUANTITY).get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    template = 'posts/search.html'
+    return render(request, template, context)
+
+
 @login_required
+@query_budget(8)
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -89,6 +193,7 @@ def post_create(request):
 
 
 @login_required
+@query_budget(8)
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if post.author != request.user:
@@ -113,6 +218,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@query_budget(4)
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -125,9 +231,14 @@ def add_comment(request, post_id):
 
 
 @login_required
+@query_budget(7)
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = include_paginator(request, post_list)
+    post_list = cards.for_cards(
+        Post.objects.filter(author__following__user=request.user))
+    page_obj = include_paginator(
+        request, post_list,
+        TimelinePaginator(request.user, POSTS_QUANTITY),
+    )
     context = {
         'page_obj': page_obj,
     }
@@ -136,6 +247,7 @@ def follow_index(request):
 
 
 @login_required
+@query_budget(10)
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author == request.user:
@@ -148,9 +260,40 @@ def profile_follow(request, username):
 
 
 @login_required
+@query_budget(6)
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(
         user=request.user, author=author
     ).delete()
     return redirect('posts:profile', username=username)
+
+
+@login_required
+@query_budget(1)
+def profile_export(request, username):
+    """Все посты и комментарии автора потоком NDJSON или CSV.
+
+    У каждой строки есть cursor; ?after=<cursor> продолжает выгрузку
+    после этой строки, например после обрыва соединения.
+    """
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        return redirect('posts:profile', username=username)
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in export.FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки.')
+    after = request.GET.get('after')
+    try:
+        after = export.decode_cursor(after) if after else None
+    except export.InvalidCursor:
+        return HttpResponseBadRequest('Некорректный курсор.')
+    render_lines, content_type = export.FORMATS[export_format]
+    response = StreamingHttpResponse(
+        render_lines(export.records(author, after)),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{author.username}.{export_format}"')
+    response['Cache-Control'] = 'private, no-store'
+    return response
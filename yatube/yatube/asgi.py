@@ -0,0 +1,26 @@
+import os
+
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+
+class AsyncFeedsHandler(ASGIHandler):
+    """ASGI-приложение, в котором ленты обслуживают асинхронные view
+    (ASGI_URLCONF)."""
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = settings.ASGI_URLCONF
+        return request, error_response
+
+
+def get_asgi_application():
+    django.setup(set_prefix=False)
+    return AsyncFeedsHandler()
+
+
+application = get_asgi_application()
@@ -0,0 +1,14 @@
+from django.urls import path
+from django.urls.conf import include
+
+from . import urls
+
+# Адреса для ASGI: posts с асинхронными лентами, остальное как в urls.
+urlpatterns = [
+    path('', include('posts.async_urls', namespace='posts')),
+    *urls.urlpatterns[1:],
+]
+
+handler403 = urls.handler403
+handler404 = urls.handler404
+handler500 = urls.handler500
@@ -27,10 +27,11 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -38,9 +39,13 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'posts.middleware.PageCacheMiddleware',
 ]
 
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
@@ -50,7 +55,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.ProfiledDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -66,6 +71,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# Адреса для ASGI-приложения yatube.asgi: ленты там асинхронные.
+ASGI_URLCONF = 'yatube.asgi_urls'
 
 
 DATABASES = {
@@ -118,8 +125,60 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+TIMELINE_FANOUT_LIMIT = 1000
+
+THUMBNAIL_WORKERS = 2
+
+# Потоки для базы, кеша и шаблонов асинхронных view (core.executor):
+# столько же соединений с базой на ASGI-процесс.
+ASYNC_DB_WORKERS = 8
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.TwoTierCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'default.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+            'L1_MAX_ENTRIES': 2000,
+            'SYNC_INTERVAL': 1.0,
+        },
     }
 }
+
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Превышение бюджета запросов view-функции (core.query_budget) — ошибка,
+# а не предупреждение в логе.
+QUERY_BUDGET_STRICT = DEBUG
+
+# Допустимое замедление микробенчмарка относительно базовой
+# линии (manage.py runbenchmarks). Число запросов сравнивается точно,
+# а время на общих машинах CI шумит, поэтому порог грубый.
+BENCHMARK_THRESHOLD = 0.5
+
+# Доля запросов, профиль которых пишется в лог core.profiling.
+SERVER_TIMING_LOG_SAMPLE_RATE = 0.0
+
+# Каталог, через который воркеры gunicorn складывают метрики (например,
+# /dev/shm/yatube-metrics). Без него /metrics/ видит только свой процесс.
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 1.0
+# Токен для сборщика метрик; сотрудникам /metrics/ доступен и без него.
+METRICS_TOKEN = ''
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}